@@ -7,16 +7,83 @@ import os
 # File Paths (檔案路徑)
 # ==========================================
 VOCAB_FILE = 'vocabulary.csv'      # 主要題庫
-ERROR_LOG_FILE = 'review_list.csv' # 錯題紀錄
+ERROR_LOG_FILE = 'review_list.csv' # 錯題紀錄 (未輸入學生代號時共用)
+MISTAKES_DIR = 'mistakes'          # 各學生專屬錯題本資料夾 (mistakes/<學生代號>.csv)
 CSS_FILE = 'styles.css'            # CSS 樣式表
+LOG_FILE = 'quiz_app.log'          # 日誌檔
 ENCODING_TYPE = 'utf-8-sig'        # CSV 編碼設定
+MISTAKE_JOURNAL_SUFFIX = '.journal' # 錯題日誌副檔名 (review_list.journal)
+VOCAB_SNAPSHOT_SUFFIX = '.snapshot' # 生字二進位快照副檔名 (vocabulary.snapshot)
+AUDIO_DIR = 'audio'                # 預先產生的語音 (generate_audio_assets.py 輸出)
+VOCAB_AUDIO_DIR = os.path.join(AUDIO_DIR, 'vocab')      # 生字語音 audio/vocab/<字>.mp3
+PRAISE_AUDIO_DIR = os.path.join(AUDIO_DIR, 'praises')   # 稱讚語音 audio/praises/<filename>.mp3
+COMPACT_AUDIO_DIR = os.path.join(AUDIO_DIR, 'compact')  # 壓縮後的語音 (process_audio_assets.py 輸出，優先使用)
+COMPACT_VOCAB_AUDIO_DIR = os.path.join(COMPACT_AUDIO_DIR, 'vocab')
+COMPACT_PRAISE_AUDIO_DIR = os.path.join(COMPACT_AUDIO_DIR, 'praises')
+AUDIO_PACK_FILE = os.path.join(AUDIO_DIR, 'vocab.pack')             # 生字語音封裝檔 (pack_audio_assets.py 輸出)
+AUDIO_PACK_INDEX = os.path.join(AUDIO_DIR, 'vocab.pack.json')       # 封裝檔索引 (字 -> [offset, length])
+REVIEW_STATE_SUFFIX = '.srs.json'  # 間隔複習狀態檔副檔名 (review_list.srs.json)
+
+# ==========================================
+# Logging (日誌)
+# ==========================================
+LOG_LEVEL = os.environ.get('QUIZ_LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = 1_000_000          # 日誌檔超過此大小時輪替
+LOG_BACKUP_COUNT = 3               # 保留的舊日誌檔數量
+
+# ==========================================
+# Storage Backend (儲存後端)
+# ==========================================
+STORAGE_BACKEND = os.environ.get('QUIZ_STORAGE_BACKEND', 'csv')  # 'csv' 或 'sqlite'
+SQLITE_DB_FILE = os.environ.get('QUIZ_SQLITE_DB', 'quiz_app.db')  # SQLite 資料庫檔案
+SQLITE_TIMEOUT = 10                # 等待資料庫鎖定的秒數
+
+# ==========================================
+# Mistake Journal (錯題日誌)
+# ==========================================
+JOURNAL_COMPACT_THRESHOLD = 200    # 累積多少筆事件後壓縮回 CSV
+MAX_LEARNER_ID_LENGTH = 40         # 學生代號最大長度
+MISTAKE_FLUSH_INTERVAL = 5         # 錯題緩衝區定時寫入間隔 (秒)；強制終止時最多遺失這段時間的紀錄
+MISTAKE_FLUSH_BATCH_SIZE = 50      # 緩衝區累積多少筆時提早寫入
 
 # ==========================================
 # Game Settings (遊戲設定)
 # ==========================================
 MIN_WORDS_FOR_QUIZ = 3             # 最少需要的生字數量
 NUM_OPTIONS = 3                    # 選項數量
-MAX_DISTRACTOR_ATTEMPTS = 100      # 尋找干擾項的最大嘗試次數
+USE_PHONETIC_DISTRACTORS = True    # 優先使用注音相似的干擾項 (較難)
+PHONETIC_DRAW_ATTEMPTS = 4         # 每個干擾項嘗試抽取相似音的次數
+QUESTION_PREFETCH = 3              # 每個 session 預先產生的題目數 (錯題複習除外)
+MISTAKE_WEIGHT = 2.0               # 一般/冒險模式中，每答錯一次增加的抽中權重 (基本權重為 1)
+MISTAKE_HALF_LIFE_DAYS = 7         # 錯題權重的半衰期 (天)，越久以前答錯的字權重越低
+
+# ==========================================
+# Audio (語音)
+# ==========================================
+AUDIO_PREFETCH_WORKERS = 4         # 背景預先下載語音的執行緒數 (所有 session 共用)
+AUDIO_CACHE_MAX_BYTES = 8_000_000  # 記憶體語音快取上限 (位元組)
+TTS_CACHE_DIR = '.tts_cache'       # 語音磁碟快取資料夾 (以 sha256 命名)
+TTS_CACHE_MAX_DISK_BYTES = 100_000_000  # 語音磁碟快取上限 (位元組)，超過時刪除最舊的語音
+TTS_LANG = 'zh-TW'                 # 線上語音的語言代碼 (也是快取鍵的一部分)
+TTS_URL = os.environ.get('QUIZ_TTS_URL', 'https://translate.google.com/translate_tts')  # 線上語音網址 (測試時可指向 stub_tts_server.py)
+TTS_CONNECT_TIMEOUT = 2            # 線上語音連線逾時 (秒)
+TTS_READ_TIMEOUT = 5               # 線上語音讀取逾時 (秒)
+AUDIO_WAIT_SECONDS = 3             # 答題後等待進行中下載的上限 (秒)，逾時這次不播放
+TTS_POOL_SIZE = 8                  # 線上語音 keep-alive 連線池大小
+TTS_BREAKER_FAILURES = 3           # 連續失敗幾次後暫停線上語音 (斷路器 open)
+TTS_BREAKER_RESET_SECONDS = 30     # 斷路器 open 多久後送出試探請求 (half-open)
+TTS_STATS_LOG_EVERY = 50           # 每幾個線上語音請求記錄一次統計 (斷路器狀態改變與結束時也會記錄)
+
+# ==========================================
+# Spaced Repetition (間隔複習，SM-2)
+# ==========================================
+SRS_INITIAL_EASE = 2.5             # 新字的難易度係數
+SRS_MIN_EASE = 1.3                 # 難易度係數下限
+SRS_QUALITY_CORRECT = 4            # 答對時的評分 (0-5)
+SRS_QUALITY_WRONG = 1              # 答錯時的評分 (0-5)
+SRS_RELEARN_DELAY_SECONDS = 60     # 答錯後多久再出現 (同一次複習中排在其他到期字之後)
+SRS_GRADUATE_INTERVAL_DAYS = 21    # 間隔達到此天數即視為學會，從錯題本移除
+SRS_SAVE_EVERY = 5                 # 每作答幾題儲存一次複習狀態
 
 # ==========================================
 # Memory Game (記憶遊戲)
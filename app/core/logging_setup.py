@@ -0,0 +1,117 @@
+# Logging setup: non-blocking queue-based pipeline
+# 日誌設定：請求路徑只把紀錄放進佇列，由背景執行緒負責寫檔
+
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Iterator, Optional
+
+from app.core import config
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - session=%(session_id)s mode=%(mode)s latency_ms=%(latency_ms)s - %(message)s'
+
+# 目前 session 的結構化欄位 (Structured fields of the current session)
+_session_id: contextvars.ContextVar[str] = contextvars.ContextVar('session_id', default='-')
+_mode: contextvars.ContextVar[str] = contextvars.ContextVar('mode', default='-')
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_setup_lock = threading.Lock()
+
+class ContextFilter(logging.Filter):
+    """
+    在紀錄中補上 session_id / mode / latency_ms 欄位。
+    Inject session_id, mode and latency_ms into every record.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'session_id'):
+            record.session_id = _session_id.get()
+        if not hasattr(record, 'mode'):
+            record.mode = _mode.get()
+        if not hasattr(record, 'latency_ms'):
+            record.latency_ms = '-'
+        return True
+
+def setup_logging() -> None:
+    """
+    設定日誌 (只執行一次)：root logger 只掛 QueueHandler，實際寫檔 (依大小輪替)
+    與輸出到終端機由背景 QueueListener 處理。
+    Configure logging once: the root logger only enqueues records, and a background
+    QueueListener writes them to a size-rotated quiz_app.log and the console.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = RotatingFileHandler(
+            config.LOG_FILE,
+            maxBytes=config.LOG_MAX_BYTES,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+        stream_handler = logging.StreamHandler()
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+
+        log_queue: queue.Queue = queue.Queue(-1)
+        _queue_handler = QueueHandler(log_queue)
+        _queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        root.setLevel(config.LOG_LEVEL)
+        root.addHandler(_queue_handler)
+
+        _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        _listener.start()
+
+def _stop_listener() -> None:
+    """
+    結束時停止背景寫檔：先寫完佇列中的紀錄，之後的紀錄改為直接寫入 (同步)，
+    所以其他 atexit 程序 (例如寫入錯題) 不論執行順序，它們的紀錄都不會遺失。
+    Stop the background writer at exit: drain the queue, then route later records
+    straight to the handlers, so other atexit hooks (e.g. the mistake flush) are
+    still logged whatever order atexit runs them in.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            handler.addFilter(ContextFilter())
+            root.addHandler(handler)
+        _listener = None
+
+# 說明：模組載入時就註冊 (早於 repositories 的 atexit 程序，LIFO 下最後執行)
+# Description: Registered at import time, before the repositories' hooks, so LIFO runs it last
+atexit.register(_stop_listener)
+
+def set_log_context(session_id: Optional[str] = None, mode: Optional[str] = None) -> None:
+    """
+    設定目前執行緒 (Streamlit session) 的結構化欄位。
+    Set the structured fields for the current script run.
+    """
+    _session_id.set(session_id or '-')
+    _mode.set(mode or '-')
+
+@contextmanager
+def log_latency(event: str, level: int = logging.DEBUG) -> Iterator[None]:
+    """
+    記錄一段程式的耗時 (latency_ms 欄位)。
+    Log how long the wrapped block took, in the latency_ms field.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latency_ms = f"{(time.perf_counter() - start) * 1000:.1f}"
+        logging.log(level, event, extra={'latency_ms': latency_ms})
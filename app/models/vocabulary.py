@@ -1,7 +1,10 @@
 # Data models for the application
 # 應用程式資料模型
 
-from typing import TypedDict, Optional
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Iterator, List, TypedDict, Optional
 
 # 說明：定義生字本的資料結構
 # Description: Define the data structure for vocabulary items
@@ -10,17 +13,154 @@ class VocabItem(TypedDict):
     zhuyin: str
     book: str
 
-# 說明：定義錯題本的資料結構 (繼承 VocabItem，未來可擴充 timestamp 等欄位)
+# 說明：定義錯題本的資料結構 (繼承 VocabItem，加上最後答錯時間與答錯次數)
 # Description: Define data structure for mistake items (inherits from VocabItem)
 class MistakeItem(VocabItem):
     timestamp: Optional[str]
+    misses: int
 
-# 說明：定義記憶卡片的資料結構
-# Description: Define the data structure for memory game cards
-class MemoryCard(TypedDict):
-    id: int
-    content: str
-    type: str          # 'char' or 'zhuyin'
-    pair_id: int
-    is_matched: bool
-    is_flipped: bool
+def parse_misses(value) -> int:
+    """讀取儲存的答錯次數欄位 (舊資料沒有此欄位或格式錯誤時為 1)"""
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+# 說明：記憶卡片。使用 __slots__，翻開/配對狀態由 MemoryBoard 管理
+# Description: A memory game card; slotted, with flip/match state kept by MemoryBoard
+class MemoryCard:
+    __slots__ = ('id', 'content', 'type', 'pair_id', 'is_matched')
+
+    def __init__(self, id: int, content: str, type: str, pair_id: int):
+        self.id = id
+        self.content = content
+        self.type = type           # 'char' or 'zhuyin'
+        self.pair_id = pair_id
+        self.is_matched = False
+
+    def __repr__(self) -> str:
+        return f"MemoryCard({self.id}, {self.content!r}, {self.type!r}, {self.pair_id})"
+
+# 翻牌結果 (Flip results)
+FLIP_IGNORED = 'ignored'     # 已配對或已翻開的卡片
+FLIP_FIRST = 'first'         # 翻開第一張
+FLIP_MATCH = 'match'         # 第二張配對成功
+FLIP_MISMATCH = 'mismatch'   # 第二張配對失敗
+
+# 說明：記憶遊戲盤面。以已配對數量計數判斷過關，翻牌/配對都是 O(1)，不需掃描整個盤面
+# Description: Memory game board. A matched-pairs counter decides when the board is solved,
+#              so every flip/match is O(1) instead of a scan over all cards
+class MemoryBoard:
+    __slots__ = ('cards', 'flipped', 'matched_pairs', 'total_pairs')
+
+    def __init__(self, cards: List[MemoryCard]):
+        self.cards = cards
+        self.flipped: List[int] = []   # 目前翻開 (尚未配對) 的卡片，最多兩張
+        self.matched_pairs = 0
+        self.total_pairs = len(cards) // 2
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    @property
+    def solved(self) -> bool:
+        return self.matched_pairs == self.total_pairs
+
+    @property
+    def has_mismatch(self) -> bool:
+        """是否有兩張翻開但不匹配的卡片"""
+        return len(self.flipped) == 2
+
+    def is_flipped(self, index: int) -> bool:
+        return index in self.flipped
+
+    def reset_flipped(self) -> None:
+        """蓋回翻開的卡片"""
+        self.flipped = []
+
+    def flip(self, index: int) -> str:
+        """
+        翻開一張卡片並更新狀態；前一次配對失敗時先自動蓋回。
+        Flip a card and advance the state machine; a previous mismatch is flipped back first.
+
+        Returns:
+            FLIP_IGNORED, FLIP_FIRST, FLIP_MATCH or FLIP_MISMATCH
+        """
+        card = self.cards[index]
+        if card.is_matched or index in self.flipped:
+            return FLIP_IGNORED
+        if len(self.flipped) == 2:
+            self.flipped = []
+
+        self.flipped.append(index)
+        if len(self.flipped) == 1:
+            return FLIP_FIRST
+
+        other = self.cards[self.flipped[0]]
+        if other.pair_id != card.pair_id:
+            return FLIP_MISMATCH
+        other.is_matched = card.is_matched = True
+        self.matched_pairs += 1
+        self.flipped = []
+        return FLIP_MATCH
+
+# 說明：共用生字表中的一筆生字。使用 __slots__ 並禁止修改，所有 session 共用同一個物件；
+#       支援 item['char'] 的寫法以相容原本的 VocabItem dict
+# Description: One entry of the shared vocabulary table. Slotted and read-only so every
+#              session can share the same object; item['char'] access stays compatible with VocabItem
+class VocabEntry:
+    __slots__ = ('char', 'zhuyin', 'book')
+
+    def __init__(self, char: str, zhuyin: str, book: str):
+        object.__setattr__(self, 'char', char)
+        object.__setattr__(self, 'zhuyin', zhuyin)
+        object.__setattr__(self, 'book', book)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VocabEntry is immutable")
+
+    def __getitem__(self, key: str) -> str:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return f"VocabEntry({self.char!r}, {self.zhuyin!r}, {self.book!r})"
+
+# 說明：session 只保存索引陣列 (由小到大排序)，實際生字由共用的生字表提供
+# Description: A session-local view that stores only a sorted index array into the shared table
+class VocabSlice(Sequence):
+    __slots__ = ('items', 'indices')
+
+    def __init__(self, items: Sequence[VocabEntry], indices: array):
+        self.items = items
+        self.indices = indices  # 必須由小到大排序 (must be sorted ascending)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.items[j] for j in self.indices[i]]
+        return self.items[self.indices[i]]
+
+    def __iter__(self) -> Iterator[VocabEntry]:
+        items = self.items
+        return (items[j] for j in self.indices)
+
+    def contains_index(self, index: int) -> bool:
+        """
+        共用生字表中的某個索引是否在此檢視內 (在排序的索引陣列上二分搜尋，O(log n)，不另存集合)。
+        Whether a table index is in this view: a bisect over the sorted index array, O(log n) with no extra copy.
+        """
+        i = bisect_left(self.indices, index)
+        return i < len(self.indices) and self.indices[i] == index
+
+    def without(self, char: str) -> 'VocabSlice':
+        """回傳去掉某個字之後的新檢視 (保持排序) (Return a new, still sorted view without the given char)"""
+        items = self.items
+        return VocabSlice(items, array(self.indices.typecode, (j for j in self.indices if items[j].char != char)))
@@ -0,0 +1,365 @@
+# Append-only journal for the mistake list
+# 錯題本的附加式日誌 (增刪事件只追加寫入，定期壓縮回 CSV)
+
+import csv
+import io
+import os
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: 只有單一行程時仍可使用執行緒鎖
+    fcntl = None
+
+from app.core import config
+from app.models.vocabulary import MistakeItem, parse_misses
+
+# 事件代碼 (Event codes)
+EVENT_ADD = '+'
+EVENT_REMOVE = '-'
+
+MISTAKE_FIELDNAMES = ['char', 'zhuyin', 'timestamp', 'misses']
+
+class MistakeJournal:
+    """
+    錯題本：記憶體中的錯題清單 + 只追加的事件日誌。
+    Mistake list kept as an in-memory view backed by an append-only event journal.
+
+    每次答錯/答對只追加一行事件，累積到一定數量後在背景執行緒把目前清單
+    整批寫回 CSV (暫存檔 + os.replace)，再清空日誌。若在寫回 CSV 與清空日誌
+    之間中斷，重播日誌後清單內容不變 (新增/移除皆為冪等操作)，只有答錯次數可能重複計算。
+    跨行程的寫入以 <journal>.lock 檔案鎖 (flock) 互斥，並在每次操作前
+    讀入其他行程新追加的事件。
+
+    寫入採 write-behind：add/remove 只更新記憶體並放進緩衝區，由 flush()
+    (定時、回主選單、程式結束時) 一次寫入並 fsync。持久性保證：flush 完成的
+    事件可承受斷電；尚未 flush 的事件 (最多 MISTAKE_FLUSH_INTERVAL 秒) 在
+    行程被強制終止時會遺失，正常結束時會由 atexit 寫入。
+
+    Every answer appends a single event line. Once enough events accumulate the
+    view is compacted into the CSV in a background thread (temp file + os.replace)
+    and the journal is truncated. Replaying a journal over an already-compacted
+    CSV yields the same list, so a crash between the two steps is harmless
+    (only the miss counts of replayed additions are counted twice).
+    Writers in other processes are serialized by an flock on <journal>.lock, and
+    their new events are replayed before every operation.
+
+    Writes are write-behind: add/remove only update memory and a buffer, and
+    flush() (on a timer, on returning to the menu and at exit) appends the batch
+    and fsyncs it. Durability: flushed events survive power loss; buffered events
+    (at most MISTAKE_FLUSH_INTERVAL seconds' worth) are lost if the process is
+    killed, and are written by the atexit hook on a normal shutdown.
+    """
+
+    def __init__(self, csv_path: str, journal_path: str):
+        self.csv_path = csv_path
+        self.journal_path = journal_path
+        self.lock_path = f"{journal_path}.lock"
+        self._view: 'OrderedDict[str, MistakeItem]' = OrderedDict()
+        self._pending_events = 0
+        self._buffer: List[List[str]] = []
+        self._journal_offset = 0
+        self._csv_signature: Optional[Tuple[int, int]] = None
+        self._compacting = False
+        self._flushing = False
+        self._lock = threading.RLock()
+        with self._locked():
+            self._load()
+
+    # ------------------------------------------
+    # 鎖定 (Locking)
+    # ------------------------------------------
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """同時取得執行緒鎖與跨行程檔案鎖"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, mode='a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ------------------------------------------
+    # 讀取 (Loading)
+    # ------------------------------------------
+    def _file_signature(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> None:
+        """從 CSV 載入基底清單，再重播日誌"""
+        self._view.clear()
+        self._pending_events = 0
+        self._journal_offset = 0
+        self._csv_signature = self._file_signature(self.csv_path)
+
+        if self._csv_signature is not None:
+            with open(self.csv_path, mode='r', encoding=config.ENCODING_TYPE) as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    clean_row = {k: v.strip() for k, v in row.items() if k and v}
+                    if 'char' in clean_row and 'zhuyin' in clean_row:
+                        # 說明：舊格式沒有 misses 欄位、每答錯一次一列，所以每列加一次
+                        # Description: Legacy files have no misses column and one row per miss, so each row adds one
+                        misses = parse_misses(clean_row['misses']) if 'misses' in clean_row else None
+                        self._apply_add(clean_row['char'], clean_row['zhuyin'], clean_row.get('timestamp'), misses)
+
+        self._replay_tail()
+
+    def _replay_tail(self) -> None:
+        """重播日誌中尚未讀過的事件 (從上次的位移開始)"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, mode='rb') as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        self._journal_offset += len(data)
+
+        for event in csv.reader(io.StringIO(data.decode('utf-8', errors='replace'))):
+            # 說明：最後一行可能因中斷而不完整，直接略過
+            # Description: The last line may be truncated by a crash; skip malformed rows
+            if self._apply_event(event):
+                self._pending_events += 1
+
+    def _apply_event(self, event: List[str]) -> bool:
+        """套用一筆事件到記憶體清單，格式不符時回傳 False"""
+        if len(event) == 4 and event[0] == EVENT_ADD:
+            self._apply_add(event[1], event[2], event[3] or None)
+        elif len(event) == 2 and event[0] == EVENT_REMOVE:
+            self._view.pop(event[1], None)
+        else:
+            return False
+        return True
+
+    def _sync(self) -> None:
+        """
+        讀入其他行程的變更：CSV 被壓縮替換或日誌被清空時整個重新載入，
+        否則只重播新追加的事件。尚未寫入的緩衝事件之後才會落在檔案中，
+        所以重新載入後再套用一次 (新增事件會累加答錯次數，不能在已套用的清單上重複套用)。
+        必須在 _locked() 內呼叫。
+        Pick up changes from other processes, then re-apply our buffered events,
+        which will land after them in the file. Additions increment miss counts, so
+        with buffered events we reload instead of replaying the tail over a view that
+        already contains them. Must be called under _locked().
+        """
+        journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        reset = self._file_signature(self.csv_path) != self._csv_signature or journal_size < self._journal_offset
+        if not reset and journal_size == self._journal_offset:
+            return
+        if not reset and not self._buffer:
+            self._replay_tail()
+            return
+        self._load()
+        for event in self._buffer:
+            self._apply_event(event)
+
+    def _apply_add(self, char: str, zhuyin: str, timestamp: Optional[str], misses: Optional[int] = None) -> None:
+        """新增或更新一筆錯題；未指定次數時答錯次數加一"""
+        if misses is None:
+            previous = self._view.get(char)
+            misses = previous['misses'] + 1 if previous else 1
+        self._view[char] = {'char': char, 'zhuyin': zhuyin, 'book': '未分類', 'timestamp': timestamp, 'misses': misses}
+
+    # ------------------------------------------
+    # 寫入 (Writing)
+    # ------------------------------------------
+    def _buffer_event(self, event: List[str]) -> None:
+        """更新記憶體清單並放入寫入緩衝區 (不做 I/O)"""
+        self._apply_event(event)
+        self._buffer.append(event)
+        # 緩衝區過大時不等計時器，直接在背景寫入
+        # Flush early in the background when the buffer grows too large
+        if len(self._buffer) >= config.MISTAKE_FLUSH_BATCH_SIZE and not self._flushing:
+            self._flushing = True
+            threading.Thread(target=self._background_flush, daemon=True).start()
+
+    def add(self, char: str, zhuyin: str) -> None:
+        """
+        新增一筆錯題 (只寫入記憶體緩衝區)。
+        Record a mistake in memory; it reaches disk on the next flush.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._buffer_event([EVENT_ADD, char, zhuyin, timestamp])
+
+    def remove(self, char: str) -> None:
+        """
+        移除一筆錯題；不在清單中時不產生事件。
+        Remove a mistake; no event is produced when the char is not in the list.
+        """
+        with self._lock:
+            if char in self._view:
+                self._buffer_event([EVENT_REMOVE, char])
+
+    def has_pending(self) -> bool:
+        """是否有尚未寫入檔案的事件"""
+        return bool(self._buffer)
+
+    def flush(self) -> None:
+        """
+        將緩衝區的事件一次追加到日誌並 fsync。
+        Append all buffered events to the journal in one write and fsync it.
+        """
+        if not self._buffer:
+            return
+        with self._locked():
+            if not self._buffer:
+                return
+            self._sync()
+
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(self._buffer)
+            data = buffer.getvalue().encode('utf-8')
+
+            with open(self.journal_path, mode='ab') as f:
+                # 說明：若前一個行程寫到一半中斷，先補上換行，避免新事件黏在殘缺的行後面
+                # Description: If a crashed writer left a partial line, start on a fresh line
+                if f.tell() > 0:
+                    with open(self.journal_path, mode='rb') as reader:
+                        reader.seek(-1, os.SEEK_END)
+                        if reader.read(1) != b'\n':
+                            data = b'\n' + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._journal_offset = f.tell()
+
+            self._pending_events += len(self._buffer)
+            self._buffer.clear()
+            self._maybe_compact()
+
+    def _background_flush(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Error flushing mistake journal {self.journal_path}: {e}")
+        finally:
+            self._flushing = False
+
+    def replace_all(self, items: List[MistakeItem]) -> None:
+        """
+        以整批資料取代目前清單並立即寫回 CSV。
+        Replace the whole list and compact immediately.
+        """
+        with self._locked():
+            self._view.clear()
+            for item in items:
+                self._apply_add(item['char'], item['zhuyin'], item.get('timestamp'), item.get('misses') or 1)
+            self._compact_locked()
+
+    def items(self) -> List[MistakeItem]:
+        """
+        取得目前錯題清單 (複本，可安全修改)。
+        Return a copy of the current mistake list (safe to mutate).
+        """
+        with self._locked():
+            self._sync()
+            return [dict(item) for item in self._view.values()]
+
+    # ------------------------------------------
+    # 壓縮 (Compaction)
+    # ------------------------------------------
+    def compact(self) -> None:
+        """
+        將目前清單寫回 CSV 並清空日誌。
+        Write the current view to the CSV and truncate the journal.
+        """
+        with self._locked():
+            self._sync()
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        temp_path = f"{self.csv_path}.{os.getpid()}.tmp"
+        with open(temp_path, mode='w', encoding=config.ENCODING_TYPE, newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=MISTAKE_FIELDNAMES, extrasaction='ignore')
+            writer.writeheader()
+            for item in self._view.values():
+                writer.writerow({
+                    'char': item['char'],
+                    'zhuyin': item['zhuyin'],
+                    'timestamp': item.get('timestamp') or '',
+                    'misses': item['misses']
+                })
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(temp_path, self.csv_path)
+
+        # 清空日誌 (緩衝事件已包含在 CSV 中)
+        # Truncate journal; buffered events are already part of the CSV
+        open(self.journal_path, mode='wb').close()
+        self._journal_offset = 0
+        self._pending_events = 0
+        self._buffer.clear()
+        self._csv_signature = self._file_signature(self.csv_path)
+        logging.info(f"Mistake journal compacted: {self.csv_path} ({len(self._view)} items)")
+
+    def _maybe_compact(self) -> None:
+        """事件數量超過門檻時，在背景執行緒進行壓縮"""
+        if self._compacting or self._pending_events < config.JOURNAL_COMPACT_THRESHOLD:
+            return
+        self._compacting = True
+        threading.Thread(target=self._background_compact, daemon=True).start()
+
+    def _background_compact(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            logging.error(f"Error compacting mistake journal {self.journal_path}: {e}")
+        finally:
+            self._compacting = False
+
+_journals: Dict[str, MistakeJournal] = {}
+_registry_lock = threading.Lock()
+
+def journal_path_for(csv_path: str) -> str:
+    """由 CSV 路徑推得日誌檔路徑"""
+    return os.path.splitext(csv_path)[0] + config.MISTAKE_JOURNAL_SUFFIX
+
+def get_journal(csv_path: str = config.ERROR_LOG_FILE) -> MistakeJournal:
+    """
+    取得指定錯題本的共用日誌物件 (每個檔案一個)。
+    Return the process-wide journal for a mistake CSV.
+    """
+    with _registry_lock:
+        journal = _journals.get(csv_path)
+        if journal is None:
+            directory = os.path.dirname(csv_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            journal = MistakeJournal(csv_path, journal_path_for(csv_path))
+            _journals[csv_path] = journal
+        return journal
+
+def flush_all() -> None:
+    """
+    寫入所有錯題本的緩衝事件。
+    Flush buffered events of every journal in this process.
+    """
+    for journal in list(_journals.values()):
+        try:
+            journal.flush()
+        except Exception as e:
+            logging.error(f"Error flushing mistake journal {journal.journal_path}: {e}")
+
+@atexit.register
+def _compact_all_on_exit() -> None:
+    """程式結束時把所有日誌 (含緩衝事件) 壓縮回 CSV"""
+    for journal in list(_journals.values()):
+        try:
+            if journal._pending_events or journal.has_pending():
+                journal.compact()
+        except Exception as e:
+            logging.error(f"Error compacting mistake journal {journal.journal_path}: {e}")
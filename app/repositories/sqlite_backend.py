@@ -0,0 +1,272 @@
+# SQLite storage backend for vocabulary and mistakes
+# SQLite 儲存後端 (WAL 模式，可供多個 Streamlit 行程共用)
+
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core import config
+from app.models.vocabulary import VocabItem, MistakeItem
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vocabulary (
+    char   TEXT PRIMARY KEY,
+    zhuyin TEXT NOT NULL,
+    book   TEXT NOT NULL DEFAULT '未分類'
+);
+CREATE TABLE IF NOT EXISTS mistakes (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    learner   TEXT NOT NULL DEFAULT '',
+    char      TEXT NOT NULL,
+    zhuyin    TEXT NOT NULL,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS review_state (
+    learner     TEXT NOT NULL,
+    char        TEXT NOT NULL,
+    ease        REAL NOT NULL,
+    interval    REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    due         REAL NOT NULL,
+    PRIMARY KEY (learner, char)
+);
+"""
+
+# 說明：索引要在欄位遷移之後建立 (舊資料庫的 mistakes 表沒有 learner 欄位)；
+#       冊別篩選在記憶體中的生字表進行 (VocabularyTable.book_index)，舊的 book 索引移除
+# Description: Indexes are created after migration (older mistakes tables lack 'learner');
+#              books are filtered in the in-memory table, so the old book index is dropped
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_mistakes_learner_char ON mistakes(learner, char);
+DROP INDEX IF EXISTS idx_vocabulary_book;
+"""
+
+# 說明：每個行程每個資料庫只開一條連線 (結構與遷移只執行一次)；Streamlit 每次 rerun 都在新的
+#       執行緒上執行，所以連線不綁定執行緒，改由 _db_lock 保證同一時間只有一個執行緒使用
+# Description: One connection per database per process, so the schema and migration run once.
+#              Streamlit runs every rerun on a fresh thread, so the connection is not tied to a
+#              thread; _db_lock ensures only one thread uses it at a time
+_connections: Dict[str, sqlite3.Connection] = {}
+_db_lock = threading.RLock()
+
+def _open(db_file: str) -> sqlite3.Connection:
+    """開啟連線並建立結構 (WAL 模式，需持有 _db_lock)"""
+    conn = sqlite3.connect(db_file, timeout=config.SQLITE_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # 說明：WAL 模式下 NORMAL 不保證最後幾個交易能承受斷電；錯題已批次寫入 (write-behind)，
+    #       每批只 fsync 一次，所以使用 FULL，flush 完成的錯題與 CSV 日誌一樣可承受斷電
+    # Description: In WAL mode NORMAL can lose the last transactions on power loss. Mistakes are
+    #              already written in write-behind batches (one fsync per batch), so use FULL: a
+    #              completed flush survives power loss, as with the CSV journal
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    conn.executescript(INDEXES)
+    return conn
+
+@contextmanager
+def connection(db_file: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """
+    取得共用的資料庫連線，在 with 區塊內獨佔使用 (第一次使用時建立結構)。
+    Yield the process-wide connection, held exclusively for the with block.
+    """
+    db_file = db_file or config.SQLITE_DB_FILE
+    with _db_lock:
+        conn = _connections.get(db_file)
+        if conn is None:
+            conn = _connections[db_file] = _open(db_file)
+        yield conn
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """為舊版資料庫補上新欄位"""
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(mistakes)")}
+    if 'learner' not in columns:
+        with conn:
+            conn.execute("ALTER TABLE mistakes ADD COLUMN learner TEXT NOT NULL DEFAULT ''")
+            conn.execute("DROP INDEX IF EXISTS idx_mistakes_char")
+
+def vocabulary_version() -> int:
+    """
+    取得生字表版本號 (每次匯入遞增)，供快取判斷是否需要重新載入。
+    Return the vocabulary version, bumped on every import, for cache invalidation.
+    """
+    with connection() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'vocabulary_version'").fetchone()
+    return row['value'] if row else 0
+
+def _bump_vocabulary_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('vocabulary_version', 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    )
+
+# ==========================================
+# Vocabulary (生字)
+# ==========================================
+def load_vocabulary() -> List[VocabItem]:
+    """
+    載入全部生字 (依匯入順序)。
+    Load every vocabulary item in import order.
+    """
+    with connection() as conn:
+        rows = conn.execute("SELECT char, zhuyin, book FROM vocabulary ORDER BY rowid").fetchall()
+    return [{'char': r['char'], 'zhuyin': r['zhuyin'], 'book': r['book']} for r in rows]
+
+# ==========================================
+# Mistakes (錯題)
+# ==========================================
+# 說明：write-behind 緩衝區，依序保存尚未寫入的 (SQL, 參數)
+# Description: Write-behind buffer of pending (sql, params) in arrival order
+_pending: List[Tuple[str, tuple]] = []
+_pending_lock = threading.Lock()
+# 說明：同一時間只有一個 flush (取出、寫入、commit 或放回)，批次才會依序寫入；
+#       新增事件只需要 _pending_lock，不必等資料庫
+# Description: One flush at a time (take, execute, commit or requeue), so batches commit in order;
+#              appending an event only needs _pending_lock and never waits for the database
+_flush_lock = threading.RLock()
+
+def has_pending() -> bool:
+    """是否有尚未寫入資料庫的錯題事件"""
+    return bool(_pending)
+
+def flush() -> None:
+    """
+    將緩衝的錯題事件在同一個交易中寫入 (計時器、回到選單與載入錯題可能同時呼叫，依序執行)。
+    Write buffered mistake events in a single transaction. Concurrent callers
+    (the flush timer, the menu, load_mistakes) are serialized so batches never
+    commit out of order.
+    """
+    with _flush_lock:
+        with _pending_lock:
+            if not _pending:
+                return
+            batch = list(_pending)
+            _pending.clear()
+        try:
+            with connection() as conn, conn:
+                for sql, params in batch:
+                    conn.execute(sql, params)
+        except Exception:
+            # 說明：寫入失敗時放回緩衝區前端 (此時沒有其他 flush 能先寫入較新的事件)，下次再試
+            # Description: Put the batch back in front of the buffer (no other flush can have
+            #              committed newer events meanwhile) so the next flush retries it
+            with _pending_lock:
+                _pending[:0] = batch
+            raise
+
+def load_mistakes(learner_id: Optional[str] = None) -> List[MistakeItem]:
+    """
+    載入某位學生的錯題 (每個字一筆，保留最後一次答錯時間與答錯次數)。
+    Load a learner's mistakes, one row per char with the latest timestamp and miss count.
+    """
+    flush()
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT char, zhuyin, MAX(timestamp) AS timestamp, COUNT(*) AS misses FROM mistakes "
+            "WHERE learner = ? GROUP BY char ORDER BY MIN(id)",
+            (learner_id or '',)
+        ).fetchall()
+    return [
+        {'char': r['char'], 'zhuyin': r['zhuyin'], 'book': '未分類', 'timestamp': r['timestamp'], 'misses': r['misses']}
+        for r in rows
+    ]
+
+def log_mistake(char: str, zhuyin: str, learner_id: Optional[str] = None) -> None:
+    """新增一筆錯題 (放入緩衝區，下次 flush 時寫入)"""
+    with _pending_lock:
+        _pending.append((
+            "INSERT INTO mistakes (learner, char, zhuyin, timestamp) VALUES (?, ?, ?, ?)",
+            (learner_id or '', char, zhuyin, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        ))
+
+def remove_mistake(char: str, learner_id: Optional[str] = None) -> None:
+    """移除某位學生某個字的所有錯題紀錄 (放入緩衝區；寫入時使用 learner/char 索引)"""
+    with _pending_lock:
+        _pending.append(("DELETE FROM mistakes WHERE learner = ? AND char = ?", (learner_id or '', char)))
+
+def replace_mistakes(items: List[MistakeItem], learner_id: Optional[str] = None) -> None:
+    """以整批資料取代某位學生的錯題 (每答錯一次一列)"""
+    # 說明：持有 flush 鎖，避免之後才寫入的舊事件蓋過這次取代
+    # Description: Hold the flush lock so no older buffered event commits after the replacement
+    with _flush_lock:
+        flush()
+        with connection() as conn, conn:
+            conn.execute("DELETE FROM mistakes WHERE learner = ?", (learner_id or '',))
+            conn.executemany(
+                "INSERT INTO mistakes (learner, char, zhuyin, timestamp) VALUES (?, ?, ?, ?)",
+                [
+                    (learner_id or '', m['char'], m['zhuyin'], m.get('timestamp') or None)
+                    for m in items for _ in range(m.get('misses') or 1)
+                ]
+            )
+
+# ==========================================
+# Review state (間隔複習狀態)
+# ==========================================
+def load_review_state(learner_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """載入某位學生的間隔複習狀態 (char -> ease/interval/repetitions/due)"""
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT char, ease, interval, repetitions, due FROM review_state WHERE learner = ?",
+            (learner_id or '',)
+        ).fetchall()
+    return {
+        r['char']: {'ease': r['ease'], 'interval': r['interval'], 'repetitions': r['repetitions'], 'due': r['due']}
+        for r in rows
+    }
+
+def save_review_state(state: Dict[str, Dict[str, float]], learner_id: Optional[str] = None) -> None:
+    """以整批資料取代某位學生的間隔複習狀態"""
+    with connection() as conn, conn:
+        conn.execute("DELETE FROM review_state WHERE learner = ?", (learner_id or '',))
+        conn.executemany(
+            "INSERT INTO review_state (learner, char, ease, interval, repetitions, due) VALUES (?, ?, ?, ?, ?, ?)",
+            [(learner_id or '', char, s['ease'], s['interval'], s['repetitions'], s['due']) for char, s in state.items()]
+        )
+
+# ==========================================
+# Import (從 CSV 匯入)
+# ==========================================
+def import_data(vocab_rows: List[VocabItem], mistakes: Dict[str, List[MistakeItem]],
+                review_states: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    """
+    一次性匯入生字、各學生的錯題與間隔複習狀態 (會取代資料庫中原有的內容)。
+    讀取 CSV、日誌與狀態檔由 vocab_repository.import_csv_into_sqlite 負責。
+    One-shot import replacing the current tables. mistakes and review_states are
+    keyed by learner id ('' for the shared list); reading the CSV files, journals
+    and state files is done by vocab_repository.import_csv_into_sqlite.
+    """
+    with connection() as conn, conn:
+        conn.execute("DELETE FROM vocabulary")
+        conn.executemany(
+            "INSERT INTO vocabulary (char, zhuyin, book) VALUES (?, ?, ?) "
+            "ON CONFLICT(char) DO UPDATE SET zhuyin = excluded.zhuyin, book = excluded.book",
+            [(r['char'], r['zhuyin'], r.get('book') or '未分類') for r in vocab_rows]
+        )
+        conn.execute("DELETE FROM mistakes")
+        # 說明：資料庫每答錯一次一列
+        # Description: The database keeps one row per miss
+        conn.executemany(
+            "INSERT INTO mistakes (learner, char, zhuyin, timestamp) VALUES (?, ?, ?, ?)",
+            [
+                (learner_id, m['char'], m['zhuyin'], m.get('timestamp') or None)
+                for learner_id, items in mistakes.items() for m in items for _ in range(m.get('misses') or 1)
+            ]
+        )
+        conn.execute("DELETE FROM review_state")
+        conn.executemany(
+            "INSERT INTO review_state (learner, char, ease, interval, repetitions, due) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (learner_id, char, s['ease'], s['interval'], s['repetitions'], s['due'])
+                for learner_id, state in review_states.items() for char, s in state.items()
+            ]
+        )
+        _bump_vocabulary_version(conn)
@@ -3,145 +3,351 @@
 
 import csv
 import os
+import json
+import re
+import hashlib
+import time
+import atexit
 import logging
-from typing import List, Dict, Optional
-from datetime import datetime
+import threading
+from typing import List, Dict, Optional, Tuple
 import streamlit as st
 
 from app.core import config
 from app.models.vocabulary import VocabItem, MistakeItem
+from app.repositories import mistake_journal, sqlite_backend, vocab_snapshot
 
-# 設定日誌
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('quiz_app.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+def use_sqlite() -> bool:
+    """是否使用 SQLite 儲存後端"""
+    return config.STORAGE_BACKEND == 'sqlite'
 
-def load_vocabulary(filename: str) -> List[VocabItem]:
+def vocabulary_signature(filename: str) -> Optional[Tuple[int, ...]]:
     """
-    載入生字檔案 (CSV)。
-    Load vocabulary file (CSV).
+    取得生字來源的版本簽章，用於判斷快取是否過期。
+    Return a version signature of the vocabulary source for cache invalidation.
+
+    Returns:
+        (mtime_ns, size) for CSV files, (version,) for SQLite, or None if missing
+    """
+    if use_sqlite() and filename == config.VOCAB_FILE:
+        return (sqlite_backend.vocabulary_version(),)
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def read_vocabulary_csv(filename: str) -> List[VocabItem]:
+    """
+    解析生字 CSV (同一個字以最後一筆為準)；讀取錯誤直接拋出。
+    Parse a vocabulary CSV, the last row for a char wins; errors propagate.
+    """
+    vocab_dict: Dict[str, VocabItem] = {}
+    with open(filename, mode='r', encoding=config.ENCODING_TYPE) as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            # 去除前後空白
+            clean_row = {k: v.strip() for k, v in row.items() if k and v}
+
+            # 確保有 char 和 zhuyin 欄位
+            if 'char' in clean_row and 'zhuyin' in clean_row:
+                vocab_dict[clean_row['char']] = {
+                    'char': clean_row['char'],
+                    'zhuyin': clean_row['zhuyin'],
+                    'book': clean_row.get('book', '未分類')
+                }
+    return list(vocab_dict.values())
+
+def load_vocabulary(filename: str, use_snapshot: bool = True) -> List[VocabItem]:
+    """
+    載入生字檔案 (CSV)；主題庫有最新的二進位快照時直接讀取快照。
+    Load vocabulary file (CSV), reading the binary snapshot instead when it is fresh.
 
     Args:
         filename: CSV file path
+        use_snapshot: Allow the precompiled snapshot for the main vocabulary file
 
     Returns:
         List of unique VocabItem
     """
-    vocab_dict: Dict[str, VocabItem] = {}
-    
+    if use_sqlite() and filename == config.VOCAB_FILE:
+        try:
+            return sqlite_backend.load_vocabulary()
+        except Exception as e:
+            logging.error(f"Error loading vocabulary from {config.SQLITE_DB_FILE}: {e}")
+            st.error(f"❌ 讀取資料庫 {config.SQLITE_DB_FILE} 時發生錯誤: {e}")
+            return []
+
+    use_snapshot = use_snapshot and filename == config.VOCAB_FILE
+    if use_snapshot:
+        snapshot = vocab_snapshot.load_snapshot(filename)
+        if snapshot is not None:
+            return snapshot.to_items()
+
     if not os.path.exists(filename):
         logging.warning(f"File not found: {filename}")
         return []
 
     try:
-        with open(filename, mode='r', encoding=config.ENCODING_TYPE) as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                # 去除前後空白
-                clean_row = {k: v.strip() for k, v in row.items() if k and v}
-                
-                # 確保有 char 和 zhuyin 欄位
-                if 'char' in clean_row and 'zhuyin' in clean_row:
-                    vocab_dict[clean_row['char']] = {
-                        'char': clean_row['char'],
-                        'zhuyin': clean_row['zhuyin'],
-                        'book': clean_row.get('book', '未分類')
-                    }
-        
-        return list(vocab_dict.values())
-        
+        items = read_vocabulary_csv(filename)
     except Exception as e:
         logging.error(f"Error loading {filename}: {e}")
         st.error(f"❌ 讀取檔案 {filename} 時發生錯誤: {e}")
         return []
 
-def log_mistake(word_data: VocabItem) -> None:
+    # 說明：已建置過快照但 CSV 有更新時，順便重建快照 (失敗不影響載入)
+    # Description: Refresh a stale snapshot that was built before; failures are non-fatal
+    if use_snapshot and os.path.exists(vocab_snapshot.snapshot_path_for(filename)):
+        try:
+            vocab_snapshot.write_snapshot(items, filename)
+        except Exception as e:
+            logging.warning(f"Could not refresh vocabulary snapshot: {e}")
+
+    return items
+
+def build_vocabulary_snapshot(filename: str = config.VOCAB_FILE) -> Optional[str]:
+    """
+    由 CSV 編譯二進位快照 (建置步驟)。
+    Compile the binary snapshot from the CSV (build step).
+
+    Returns:
+        Snapshot path, or None if the CSV had no usable rows
+    """
+    items = load_vocabulary(filename, use_snapshot=False)
+    if not items:
+        return None
+    return vocab_snapshot.write_snapshot(items, filename)
+
+# ==========================================
+# Import into SQLite (匯入 SQLite)
+# ==========================================
+def csv_learner_ids() -> List[str]:
+    """
+    列出 CSV 後端中有資料的學生代號 (有 .csv、日誌檔或複習狀態檔)，依代號排序。
+    List learner ids that have a mistake CSV, journal or review state in MISTAKES_DIR.
+    """
+    if not os.path.isdir(config.MISTAKES_DIR):
+        return []
+    learner_ids = set()
+    for name in os.listdir(config.MISTAKES_DIR):
+        for suffix in ('.csv', config.MISTAKE_JOURNAL_SUFFIX, config.REVIEW_STATE_SUFFIX):
+            if name.endswith(suffix) and len(name) > len(suffix):
+                learner_ids.add(name[:-len(suffix)])
+    return sorted(learner_ids)
+
+def import_csv_into_sqlite(vocab_file: str = config.VOCAB_FILE) -> Tuple[int, int, int]:
+    """
+    把 CSV 後端的資料一次匯入 SQLite (取代資料庫原有內容)。
+    錯題經由日誌讀取 (CSV + 尚未壓縮的日誌事件)，只有日誌檔的學生也會匯入；
+    各學生的間隔複習狀態 (.srs.json) 一併匯入。
+    One-shot import of the CSV backend into SQLite, replacing its contents.
+    Mistakes are read through the journals (CSV plus events not yet compacted),
+    so learners whose data only lives in a journal are imported too. Each
+    learner's spaced-repetition state (.srs.json) is migrated as well.
+
+    Returns:
+        (vocabulary rows, mistake items, review cards) imported
+    """
+    vocab_rows = read_vocabulary_csv(vocab_file)
+
+    # 共用錯題本的 learner 為空字串，各學生錯題本以檔名為代號
+    # The shared list uses learner '', per-learner files use their file name
+    sources = [('', config.ERROR_LOG_FILE)]
+    sources.extend((learner_id, os.path.join(config.MISTAKES_DIR, f"{learner_id}.csv")) for learner_id in csv_learner_ids())
+    mistakes: Dict[str, List[MistakeItem]] = {}
+    review_states: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for learner_id, csv_path in sources:
+        if os.path.exists(csv_path) or os.path.exists(mistake_journal.journal_path_for(csv_path)):
+            mistakes[learner_id] = mistake_journal.get_journal(csv_path).items()
+        state = read_review_state_file(os.path.splitext(csv_path)[0] + config.REVIEW_STATE_SUFFIX)
+        if state:
+            review_states[learner_id] = state
+
+    sqlite_backend.import_data(vocab_rows, mistakes, review_states)
+    mistake_count = sum(len(items) for items in mistakes.values())
+    card_count = sum(len(state) for state in review_states.values())
+    logging.info(f"Imported {len(vocab_rows)} vocabulary rows, {mistake_count} mistakes and "
+                 f"{card_count} review cards into {config.SQLITE_DB_FILE}")
+    return len(vocab_rows), mistake_count, card_count
+
+# ==========================================
+# Write-behind flushing (錯題延遲寫入)
+# ==========================================
+_flusher_lock = threading.Lock()
+_flusher_started = False
+
+def flush_mistakes() -> None:
+    """
+    將所有緩衝中的錯題事件寫入儲存後端 (回主選單、遊戲結束、定時、程式結束時呼叫)。
+    Flush buffered mistake events to the storage backend.
+    """
+    try:
+        if sqlite_backend.has_pending():
+            sqlite_backend.flush()
+    except Exception as e:
+        logging.error(f"Error flushing mistakes to {config.SQLITE_DB_FILE}: {e}")
+    mistake_journal.flush_all()
+
+def _flusher_loop() -> None:
+    while True:
+        time.sleep(config.MISTAKE_FLUSH_INTERVAL)
+        flush_mistakes()
+
+def _ensure_flusher() -> None:
+    """第一次有錯題事件時啟動背景定時寫入執行緒"""
+    global _flusher_started
+    if _flusher_started:
+        return
+    with _flusher_lock:
+        if not _flusher_started:
+            threading.Thread(target=_flusher_loop, name="mistake-flusher", daemon=True).start()
+            _flusher_started = True
+
+atexit.register(flush_mistakes)
+
+def normalize_learner_id(learner_id: Optional[str]) -> Optional[str]:
+    """
+    將學生代號轉成可安全當作檔名的字串；空白代號回傳 None (使用共用錯題本)。
+    代號需要替換字元或截斷時加上原始代號的雜湊，避免 "a.b"、"a b"、"a_b" 共用同一個錯題本；
+    本來就安全的代號維持不變 (既有檔案仍可使用)。
+    Normalize a learner id into a filename-safe key; blank ids map to None (shared list).
+    Ids that need replacing or truncating get a hash of the raw id appended, so
+    "a.b", "a b" and "a_b" never share a file; already-safe ids are unchanged.
+    """
+    if not learner_id or not learner_id.strip():
+        return None
+    raw_id = learner_id.strip()
+    safe_id = re.sub(r'[^\w\-]', '_', raw_id)
+    if safe_id == raw_id and len(safe_id) <= config.MAX_LEARNER_ID_LENGTH:
+        return safe_id
+    digest = hashlib.sha256(raw_id.encode('utf-8')).hexdigest()[:8]
+    return f"{safe_id[:config.MAX_LEARNER_ID_LENGTH - len(digest) - 1]}-{digest}"
+
+def mistake_file_for(learner_id: Optional[str] = None) -> str:
+    """
+    取得學生專屬的錯題本路徑 (未指定學生時為共用的 review_list.csv)。
+    Return the mistake CSV path for a learner (the shared review_list.csv if none).
+    """
+    safe_id = normalize_learner_id(learner_id)
+    if safe_id is None:
+        return config.ERROR_LOG_FILE
+    return os.path.join(config.MISTAKES_DIR, f"{safe_id}.csv")
+
+def load_mistakes(learner_id: Optional[str] = None) -> List[MistakeItem]:
+    """
+    載入錯題本 (記憶體中的最新清單)。
+    Load the current mistake list from the in-memory journal view.
+
+    Args:
+        learner_id: Learner whose mistakes to load (None for the shared list)
+
+    Returns:
+        List of MistakeItem (copies, safe to mutate)
+    """
+    filename = mistake_file_for(learner_id)
+    try:
+        if use_sqlite():
+            return sqlite_backend.load_mistakes(normalize_learner_id(learner_id))
+        return mistake_journal.get_journal(filename).items()
+    except Exception as e:
+        logging.error(f"Error loading mistakes: {e}")
+        st.error(f"❌ 讀取檔案 {filename} 時發生錯誤: {e}")
+        return []
+
+def log_mistake(word_data: VocabItem, learner_id: Optional[str] = None) -> None:
     """
-    將答錯的題目寫入錯題本。
-    Log mistaken word to file.
+    將答錯的題目寫入錯題本 (write-behind：先放入記憶體緩衝區，定時批次寫入)。
+    Log mistaken word; the event is buffered in memory and written in batches.
 
     Args:
         word_data: The vocabulary item that was answered incorrectly
+        learner_id: Learner who answered (None for the shared list)
     """
-    file_exists = os.path.isfile(config.ERROR_LOG_FILE)
-    
+    _ensure_flusher()
     try:
-        with open(config.ERROR_LOG_FILE, mode='a', newline='', encoding=config.ENCODING_TYPE) as f:
-            fieldnames = ['char', 'zhuyin', 'timestamp']
-            # 說明：使用 extrasaction='ignore' 避免因為 word_data 包含 'book' 而報錯
-            # Description: Use extrasaction='ignore' to prevent errors when word_data contains 'book'
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-
-            if not file_exists:
-                writer.writeheader()
-
-            writer.writerow({
-                'char': word_data['char'],
-                'zhuyin': word_data['zhuyin'],
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            
+        if use_sqlite():
+            sqlite_backend.log_mistake(word_data['char'], word_data['zhuyin'], normalize_learner_id(learner_id))
+            return
+        mistake_journal.get_journal(mistake_file_for(learner_id)).add(word_data['char'], word_data['zhuyin'])
     except Exception as e:
         logging.error(f"Error logging mistake: {e}")
         st.error("❌ 錯題記錄失敗，請檢查檔案權限")
 
-def remove_mistake_from_file(target: VocabItem) -> None:
+def remove_mistake_from_file(target: VocabItem, learner_id: Optional[str] = None) -> None:
     """
-    從錯題本檔案中移除答對的字。
-    Remove corrected word from mistake file.
+    從錯題本移除答對的字 (放入緩衝區，不重寫整個檔案)。
+    Remove corrected word from the mistake list via a buffered journal event.
     """
-    if not os.path.exists(config.ERROR_LOG_FILE):
-        return
-
+    _ensure_flusher()
     try:
-        # 讀取現有錯題
-        rows = []
-        with open(config.ERROR_LOG_FILE, mode='r', encoding=config.ENCODING_TYPE) as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['char'] != target['char']:
-                    rows.append(row)
-        
-        # 寫回檔案
-        with open(config.ERROR_LOG_FILE, mode='w', encoding=config.ENCODING_TYPE, newline='') as csvfile:
-            # 說明：包含 timestamp 以避免 DictWriter 因為多出欄位而報錯
-            # Description: Include timestamp to prevent DictWriter from erroring on extra fields
-            fieldnames = ['char', 'zhuyin', 'timestamp']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(rows)
-            
+        if use_sqlite():
+            sqlite_backend.remove_mistake(target['char'], normalize_learner_id(learner_id))
+            return
+        mistake_journal.get_journal(mistake_file_for(learner_id)).remove(target['char'])
     except Exception as e:
         logging.error(f"Error removing mistake {target['char']}: {e}")
         # 說明：這裡不再直接呼叫 st.error，由 UI 層決定如何顯示
         # Description: Avoid calling st.error directly here to keep repository clean
         raise e
 
-def save_mistakes_cache(cache: List[VocabItem]) -> None:
+def save_mistakes_cache(cache: List[VocabItem], learner_id: Optional[str] = None) -> None:
     """
     將錯題本快取整批寫回檔案。
     Save mistake cache to file in batch.
     """
     try:
-        with open(config.ERROR_LOG_FILE, mode='w', encoding=config.ENCODING_TYPE, newline='') as csvfile:
-            fieldnames = ['char', 'zhuyin', 'timestamp']
-            # 說明：加入 extrasaction='ignore' 避免 DictWriter 因為多出欄位而報錯
-            # Description: Add extrasaction='ignore' to prevent errors on extra fields
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            
-            for mistake in cache:
-                writer.writerow({
-                    'char': mistake['char'],
-                    'zhuyin': mistake['zhuyin'],
-                    'timestamp': mistake.get('timestamp', '')
-                })
+        if use_sqlite():
+            sqlite_backend.replace_mistakes(cache, normalize_learner_id(learner_id))
+        else:
+            mistake_journal.get_journal(mistake_file_for(learner_id)).replace_all(cache)
         logging.info(f"Mistakes saved: {len(cache)} items")
     except Exception as e:
         logging.error(f"Error saving mistakes: {e}")
         st.error("❌ 儲存錯題本失敗")
+
+def review_state_file_for(learner_id: Optional[str] = None) -> str:
+    """間隔複習狀態檔路徑 (與錯題本放在一起，例如 review_list.srs.json)"""
+    return os.path.splitext(mistake_file_for(learner_id))[0] + config.REVIEW_STATE_SUFFIX
+
+def read_review_state_file(filename: str) -> Dict[str, Dict[str, float]]:
+    """讀取 CSV 後端的間隔複習狀態檔 (不存在時為空)；讀取錯誤直接拋出"""
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, mode='r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_review_state(learner_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    載入學生的間隔複習狀態 (每個字的 ease / interval / repetitions / due)。
+    Load a learner's spaced-repetition state.
+
+    Returns:
+        Mapping of char to card state (empty if none saved yet)
+    """
+    try:
+        if use_sqlite():
+            return sqlite_backend.load_review_state(normalize_learner_id(learner_id))
+        return read_review_state_file(review_state_file_for(learner_id))
+    except Exception as e:
+        logging.error(f"Error loading review state: {e}")
+        return {}
+
+def save_review_state(state: Dict[str, Dict[str, float]], learner_id: Optional[str] = None) -> None:
+    """
+    儲存學生的間隔複習狀態 (CSV 後端寫暫存檔後以 os.replace 取代)。
+    Save a learner's spaced-repetition state (temp file + os.replace for the CSV backend).
+    """
+    try:
+        if use_sqlite():
+            sqlite_backend.save_review_state(state, normalize_learner_id(learner_id))
+            return
+        filename = review_state_file_for(learner_id)
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_path, mode='w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, filename)
+    except Exception as e:
+        logging.error(f"Error saving review state: {e}")
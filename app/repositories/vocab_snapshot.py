@@ -0,0 +1,136 @@
+# Precompiled binary vocabulary snapshot
+# 預先編譯的生字二進位快照 (加快冷啟動)
+#
+# 檔案格式 (File layout, little-endian):
+#   header : magic 'VSNP', version, source mtime_ns, source size, item count, book count
+#   blobs  : chars / zhuyins / books，各自以 \0 連接的 UTF-8 字串，前綴 uint32 長度
+#   ids    : array('H') 冊別編號，每個字一個
+#
+# 快照不儲存字 -> 索引的對照表；VocabularyTable 載入後 (不論來源是快照或 CSV) 才建立 char_index。
+# The char -> index map is not stored; VocabularyTable builds char_index from the loaded rows.
+
+import os
+import sys
+import struct
+import logging
+from array import array
+from typing import List, NamedTuple, Optional, Tuple
+
+from app.core import config
+from app.models.vocabulary import VocabItem
+
+MAGIC = b'VSNP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHqqII')
+BLOB_LENGTH = struct.Struct('<I')
+SEPARATOR = '\0'
+
+class VocabSnapshot(NamedTuple):
+    """
+    以欄為單位儲存的生字資料 (字串皆已 intern)。
+    Column-oriented vocabulary data with interned strings.
+    """
+    chars: Tuple[str, ...]
+    zhuyins: Tuple[str, ...]
+    books: Tuple[str, ...]
+    book_ids: array
+
+    def to_items(self) -> List[VocabItem]:
+        """轉成 VocabItem 清單"""
+        books = self.books
+        return [
+            {'char': char, 'zhuyin': zhuyin, 'book': books[book_id]}
+            for char, zhuyin, book_id in zip(self.chars, self.zhuyins, self.book_ids)
+        ]
+
+def snapshot_path_for(csv_path: str) -> str:
+    """由 CSV 路徑推得快照檔路徑"""
+    return os.path.splitext(csv_path)[0] + config.VOCAB_SNAPSHOT_SUFFIX
+
+def _source_signature(csv_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def write_snapshot(items: List[VocabItem], csv_path: str, snapshot_path: Optional[str] = None) -> str:
+    """
+    將生字清單編譯成二進位快照 (暫存檔 + os.replace)。
+    Compile vocabulary items into a binary snapshot (temp file + os.replace).
+
+    Args:
+        items: Parsed vocabulary items
+        csv_path: Source CSV, whose mtime/size are recorded for staleness checks
+        snapshot_path: Output path (defaults to <csv>.snapshot)
+
+    Returns:
+        Snapshot file path
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    signature = _source_signature(csv_path) or (0, 0)
+
+    book_ids = {}
+    ids = array('H')
+    for item in items:
+        ids.append(book_ids.setdefault(item['book'], len(book_ids)))
+    books = list(book_ids)
+
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, signature[0], signature[1], len(items), len(books)))
+        for column in ([i['char'] for i in items], [i['zhuyin'] for i in items], books):
+            blob = SEPARATOR.join(column).encode('utf-8')
+            f.write(BLOB_LENGTH.pack(len(blob)))
+            f.write(blob)
+        if sys.byteorder != 'little':
+            ids.byteswap()
+        f.write(ids.tobytes())
+    os.replace(temp_path, snapshot_path)
+    logging.info(f"Vocabulary snapshot written: {snapshot_path} ({len(items)} items, {len(books)} books)")
+    return snapshot_path
+
+def load_snapshot(csv_path: str, snapshot_path: Optional[str] = None) -> Optional[VocabSnapshot]:
+    """
+    一次讀入快照；快照不存在、格式不符或比 CSV 舊時回傳 None。
+    Load a snapshot in a single read; returns None if missing, invalid or stale.
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(csv_path)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    try:
+        magic, version, mtime_ns, size, count, book_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            logging.warning(f"Ignoring snapshot with unknown format: {snapshot_path}")
+            return None
+        if (mtime_ns, size) != _source_signature(csv_path):
+            logging.info(f"Snapshot is stale: {snapshot_path}")
+            return None
+
+        offset = HEADER.size
+        columns = []
+        for expected in (count, count, book_count):
+            (length,) = BLOB_LENGTH.unpack_from(data, offset)
+            offset += BLOB_LENGTH.size
+            text = data[offset:offset + length].decode('utf-8')
+            offset += length
+            values = tuple(map(sys.intern, text.split(SEPARATOR))) if expected else ()
+            if len(values) != expected:
+                raise ValueError("column length mismatch")
+            columns.append(values)
+
+        ids = array('H')
+        ids.frombytes(data[offset:offset + count * ids.itemsize])
+        if sys.byteorder != 'little':
+            ids.byteswap()
+        if len(ids) != count:
+            raise ValueError("book id array truncated")
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        logging.warning(f"Ignoring corrupt snapshot {snapshot_path}: {e}")
+        return None
+
+    return VocabSnapshot(columns[0], columns[1], columns[2], ids)
@@ -0,0 +1,123 @@
+# Process-wide vocabulary store
+# 共用生字庫 (所有 session 共用同一份記憶體資料)
+
+import sys
+import threading
+import logging
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from app.core import config
+from app.models.vocabulary import VocabItem, VocabEntry, VocabSlice
+from app.repositories import vocab_repository
+from app.services.phonetic_index import PhoneticIndex
+
+# 來源簽章 (CSV 為 mtime_ns/size，SQLite 為版本號)，用來判斷資料是否有變動
+# Source signature (mtime_ns/size for CSV, version for SQLite) used to detect changes
+FileSignature = Optional[Tuple[int, ...]]
+
+# 索引陣列型別 (unsigned int，每筆 4 bytes)
+INDEX_TYPECODE = 'I'
+
+def book_sort_key(book_name: str) -> int:
+    """自定義排序函式 (讓第一冊、第二冊...依序排列)"""
+    cn_map = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+    if book_name.startswith("第") and book_name.endswith("冊"):
+        num_str = book_name[1:-1]
+        if num_str in cn_map:
+            return cn_map[num_str]
+    return 100
+
+class VocabularyTable:
+    """
+    不可變的生字表，解析一次後由所有 session 共用，並預先建好冊別與字的索引。
+    Immutable vocabulary table shared by every session, with prebuilt book and char indexes.
+
+    Sessions never copy entries: they keep a VocabSlice (an index array into items).
+    """
+    __slots__ = ('items', 'signature', 'books', 'book_index', 'char_index', 'phonetic_index')
+
+    def __init__(self, rows: Iterable[VocabItem], signature: FileSignature):
+        self.signature = signature
+        self.items: Tuple[VocabEntry, ...] = tuple(
+            VocabEntry(sys.intern(row['char']), sys.intern(row['zhuyin']), sys.intern(row['book']))
+            for row in rows
+        )
+
+        # 冊別 -> 該冊生字的索引陣列 (Book -> index array of that book's entries)
+        self.book_index: Dict[str, array] = {}
+        self.char_index: Dict[str, int] = {}
+        for i, entry in enumerate(self.items):
+            self.book_index.setdefault(entry.book, array(INDEX_TYPECODE)).append(i)
+            self.char_index[entry.char] = i
+
+        # 排序後的冊別 (Sorted book names)
+        self.books: Tuple[str, ...] = tuple(sorted(self.book_index, key=book_sort_key))
+
+        # 說明：注音相似度索引在載入時一起建立，不留給第一題的請求 (約 10 ms / 1.3k 字，5 萬個雙音節詞約 1.7 秒)
+        # Description: Build the zhuyin similarity index with the table instead of on the first
+        #              question's request (about 10 ms for 1.3k words, about 1.7 s for 50k two-syllable phrases)
+        self.phonetic_index: Optional[PhoneticIndex] = PhoneticIndex(self.items) if config.USE_PHONETIC_DISTRACTORS else None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index: int) -> VocabEntry:
+        return self.items[index]
+
+    def __iter__(self) -> Iterator[VocabEntry]:
+        return iter(self.items)
+
+    def items_for_books(self, books: Iterable[str]) -> VocabSlice:
+        """
+        取得所選冊別的生字檢視 (預先切好的索引陣列串接後排序)。
+        Return a view of the selected books: the precomputed index arrays, concatenated and sorted.
+        """
+        indices = array(INDEX_TYPECODE)
+        for book in dict.fromkeys(books):
+            indices.extend(self.book_index.get(book, ()))
+        return VocabSlice(self.items, array(INDEX_TYPECODE, sorted(indices)))
+
+    def slice_for_chars(self, chars: Iterable[str], books: Optional[Iterable[str]] = None) -> VocabSlice:
+        """
+        取得指定字 (可再限定冊別) 的生字檢視；不在生字表中的字會被略過。
+        Return a view of the given chars, optionally limited to some books; unknown chars are skipped.
+        """
+        selected_books = set(books) if books is not None else None
+        indices = array(INDEX_TYPECODE)
+        for char in dict.fromkeys(chars):
+            index = self.char_index.get(char)
+            if index is not None and (selected_books is None or self.items[index].book in selected_books):
+                indices.append(index)
+        return VocabSlice(self.items, array(INDEX_TYPECODE, sorted(indices)))
+
+_tables: Dict[str, VocabularyTable] = {}
+_lock = threading.Lock()
+
+def get_vocabulary(filename: str = config.VOCAB_FILE) -> VocabularyTable:
+    """
+    取得共用生字表，只有在來源檔案的 mtime/大小 (或資料庫版本) 改變時才重新解析。
+    Return the shared vocabulary table, re-parsing only when the source's mtime/size (or SQLite version) changes.
+
+    Args:
+        filename: CSV file path
+
+    Returns:
+        Shared VocabularyTable (do not mutate its items)
+    """
+    signature = vocab_repository.vocabulary_signature(filename)
+    table = _tables.get(filename)
+    if table is not None and table.signature == signature:
+        return table
+
+    with _lock:
+        # 說明：取得鎖之後再檢查一次，避免多個 session 同時重複解析
+        # Description: Re-check under the lock so concurrent sessions parse only once
+        table = _tables.get(filename)
+        if table is not None and table.signature == signature:
+            return table
+
+        table = VocabularyTable(vocab_repository.load_vocabulary(filename), signature)
+        _tables[filename] = table
+        logging.info(f"Vocabulary loaded: {filename} ({len(table)} items)")
+        return table
@@ -0,0 +1,169 @@
+# Content-addressed TTS audio cache (disk + in-memory LRU)
+# 語音快取：磁碟上以內容雜湊為檔名，記憶體中以 LRU 保留最近使用的語音
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.core import config
+
+def cache_key(text: str, lang: str) -> str:
+    """以語言與文字計算快取鍵 (sha256)"""
+    return hashlib.sha256(f"{lang}\0{text}".encode('utf-8')).hexdigest()
+
+def prune_directory(directory: str, max_bytes: int, target_ratio: float = 0.9) -> Tuple[List[str], int]:
+    """
+    資料夾 (含子資料夾) 超過 max_bytes 時，依修改時間刪除最舊的檔案，直到降到上限的 target_ratio。
+    回傳 (刪除的路徑, 剩餘位元組)。需要掃描整個資料夾，只在超過上限時呼叫。
+
+    Delete the oldest files (by mtime) under directory until it is back to
+    target_ratio * max_bytes. Returns (removed paths, remaining bytes). This scans
+    the whole tree, so callers only run it once their running total exceeds the budget.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed: List[str] = []
+    if total <= max_bytes:
+        return removed, total
+    target = max_bytes * target_ratio
+    for _, size, path in sorted(files):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(path)
+    return removed, total
+
+class AudioCache:
+    """
+    語音快取：先查記憶體 LRU (依位元組上限淘汰)，再查磁碟。
+    磁碟檔案以 sha256(lang + text) 命名並依前兩碼分資料夾，寫入時用暫存檔 + os.replace，
+    多個行程同時寫入同一個檔案也不會讀到不完整的內容。
+    磁碟部分累計寫入的位元組，超過 max_disk_bytes 時刪除最舊的檔案。
+
+    TTS audio cache: an in-memory LRU bounded by a byte budget in front of a disk store.
+    Files are named by sha256(lang + text) and sharded by the first two hex digits;
+    writes go through a temp file and os.replace, so concurrent writers never expose
+    a partial file. The disk store keeps a running byte total and prunes the oldest
+    files once it exceeds max_disk_bytes.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int, max_disk_bytes: int):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # 磁碟快取目前的大小 (第一次寫入時掃描)
+        self._disk_lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _remember(self, key: str, data: bytes) -> None:
+        """放入記憶體 LRU，超過位元組上限時淘汰最久未使用的語音 (需持有鎖)"""
+        if len(data) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, text: str, lang: str) -> Optional[bytes]:
+        """
+        取得快取的語音；記憶體沒有時讀磁碟並放回記憶體。
+        Return cached audio, promoting disk hits into memory; None on a miss.
+        """
+        key = cache_key(text, lang)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        try:
+            with open(self.path_for(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data:
+            return None
+
+        with self._lock:
+            self._remember(key, data)
+        return data
+
+    def contains(self, text: str, lang: str) -> bool:
+        """是否已有快取 (不讀取內容)"""
+        key = cache_key(text, lang)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self.path_for(key))
+
+    def put(self, text: str, lang: str, data: bytes) -> None:
+        """
+        寫入快取 (記憶體與磁碟)；磁碟寫入失敗只記錄警告。
+        Store audio in memory and on disk; disk failures are logged and ignored.
+        """
+        key = cache_key(text, lang)
+        with self._lock:
+            self._remember(key, data)
+
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write TTS cache file {path}: {e}")
+            return
+        self._track_disk_bytes(len(data))
+
+    def _track_disk_bytes(self, added: int) -> None:
+        """累計磁碟快取的大小，超過上限時刪除最舊的語音 (只在超過時才掃描資料夾)"""
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                _, self._disk_bytes = prune_directory(self.directory, self.max_disk_bytes)
+                return
+            self._disk_bytes += added
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            removed, self._disk_bytes = prune_directory(self.directory, self.max_disk_bytes)
+        logging.info(f"Pruned {len(removed)} clips from {self.directory}")
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> AudioCache:
+    """取得全程式共用的語音快取 (Return the process-wide audio cache)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AudioCache(config.TTS_CACHE_DIR, config.AUDIO_CACHE_MAX_BYTES, config.TTS_CACHE_MAX_DISK_BYTES)
+    return _cache
@@ -0,0 +1,214 @@
+# Packed audio archive (one data file + char -> (offset, length) index)
+# 語音封裝檔：所有生字語音串接成一個檔案，另以 JSON 索引記錄每個字的位置，以 mmap 讀取
+
+import os
+import json
+import hashlib
+import mmap
+import logging
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from app.core import config
+
+PACK_VERSION = 2
+
+class PackIndex(NamedTuple):
+    """
+    封裝檔索引：每個字的 (offset, length)，以及資料檔有效部分的長度與 sha256，
+    讀取端據此確認索引與資料檔是同一份 (重建換檔的瞬間不會用舊索引讀新資料)。
+    附加只寫在有效部分之後，所以附加進行中校驗值仍然相符。
+    Pack index: each char's (offset, length) plus the size and sha256 of the data
+    file's indexed prefix, so readers can tell the index belongs to the data file
+    they mapped. Appends only write past that prefix, so they never invalidate it.
+    """
+    clips: Dict[str, Tuple[int, int]]
+    data_size: int = 0
+    data_sha256: Optional[str] = None
+    source: Optional[str] = None       # 打包來源資料夾 (Directory the clips were packed from)
+
+def data_digest(f, size: int) -> str:
+    """資料檔前 size 位元組的 sha256 (sha256 of the first size bytes of an open file)"""
+    digest = hashlib.sha256()
+    f.seek(0)
+    remaining = size
+    while remaining > 0:
+        chunk = f.read(min(remaining, 1 << 20))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest()
+
+def read_index(index_path: str) -> PackIndex:
+    """
+    讀取索引檔；不存在或格式不符時回傳空索引。
+    Read the pack index; a missing or unreadable index is treated as empty.
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return PackIndex({})
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read audio pack index {index_path}: {e}")
+        return PackIndex({})
+    if data.get('version') != PACK_VERSION:
+        logging.warning(f"Unsupported audio pack version in {index_path}: {data.get('version')}")
+        return PackIndex({})
+    clips = {text: (int(offset), int(length)) for text, (offset, length) in data.get('clips', {}).items()}
+    return PackIndex(clips, int(data.get('data_size', 0)), data.get('data_sha256'), data.get('source'))
+
+def write_index(index_path: str, index: PackIndex) -> None:
+    """以暫存檔 + os.replace 寫入索引 (Atomically write the pack index)"""
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': PACK_VERSION,
+            'data_size': index.data_size,
+            'data_sha256': index.data_sha256,
+            'source': index.source,
+            'clips': {text: list(pos) for text, pos in index.clips.items()},
+        }, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, index_path)
+
+def append_clips(data_path: str, index_path: str, clips: Iterable[Tuple[str, bytes]], rebuild: bool = False, source: Optional[str] = None) -> int:
+    """
+    把新的或內容有變的語音附加到封裝檔尾端並更新索引，回傳寫入的數量 (rebuild 時全部重新打包)。
+    內容與封裝檔中相同的字會略過；改過的字 (例如重新產生) 附加新版本並指向新位置，
+    舊版本成為無用空間，直到下次 rebuild。
+    先寫入並 fsync 資料再換上新索引，所以讀取端 (舊索引) 永遠只看到完整的語音；
+    上次中斷留下、索引沒有涵蓋的尾端資料會先截掉。
+
+    Append new or changed clips to the pack and update the index; returns how many
+    were written (everything when rebuild is set). Clips identical to the packed
+    copy are skipped; a changed clip (e.g. regenerated) is appended and the index
+    points at the new copy, leaving the old bytes as dead space until a rebuild.
+    Data is written and fsynced before the new index replaces the old one, so
+    readers holding the old index only ever see complete clips; bytes past the
+    indexed end (left by an interrupted append) are truncated first.
+    """
+    index = PackIndex({}) if rebuild else read_index(index_path)
+    if index.clips and source is not None and index.source != source:
+        # 說明：來源資料夾換了 (例如改用壓縮版)，全部重新打包，避免每個字都留下一份舊版本
+        # Description: The source changed (e.g. to the compact clips); repack everything instead of
+        #              appending a second copy of every clip
+        logging.info(f"Audio pack source changed from {index.source} to {source}; rebuilding")
+        rebuild, index = True, PackIndex({})
+    positions = dict(index.clips)
+    end = max((offset + length for offset, length in positions.values()), default=0)
+
+    # 說明：重建時寫到新檔再換上，不截斷其他行程正在 mmap 的舊檔
+    # Description: A rebuild writes a new file and swaps it in, never truncating a file others have mapped
+    target_path = f"{data_path}.{os.getpid()}.tmp" if rebuild else data_path
+    written = 0
+    mode = 'r+b' if os.path.exists(target_path) else 'w+b'
+    with open(target_path, mode) as f:
+        # 說明：索引屬於別的資料檔 (例如被換掉) 時不能沿用它的位置
+        # Description: An index that belongs to another data file cannot be reused
+        if positions and (os.fstat(f.fileno()).st_size < index.data_size
+                          or data_digest(f, index.data_size) != index.data_sha256):
+            logging.warning(f"Audio pack index does not match {data_path}; repacking every clip")
+            positions, end = {}, 0
+        f.truncate(end)
+        for text, data in clips:
+            if not data:
+                continue
+            pos = positions.get(text)
+            if pos is not None and pos[1] == len(data):
+                f.seek(pos[0])
+                if f.read(pos[1]) == data:
+                    continue
+            f.seek(end)
+            f.write(data)
+            positions[text] = (end, len(data))
+            end += len(data)
+            written += 1
+        f.flush()
+        os.fsync(f.fileno())
+        digest = data_digest(f, end)
+
+    if rebuild:
+        os.replace(target_path, data_path)
+    if written or rebuild or positions != index.clips or source != index.source:
+        write_index(index_path, PackIndex(positions, end, digest, source))
+    return written
+
+class AudioPack:
+    """
+    唯讀的語音封裝檔：以 mmap 對應整個資料檔，取語音只是切片，不需要每個字開一次檔案。
+    索引檔更新 (打包程式附加新字) 時會自動重新載入。
+
+    Read-only view of a packed audio archive. The data file is memory-mapped, so a
+    lookup is a slice instead of a file open per clip. The pack is reopened when
+    the index file changes (e.g. after the packer appended new words).
+    """
+
+    def __init__(self, data_path: str, index_path: str):
+        self.data_path = data_path
+        self.index_path = index_path
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        """索引檔的修改時間改變時重新開啟 (需持有鎖)"""
+        try:
+            stat = os.stat(self.index_path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+
+        if self._map is not None:
+            self._map.close()
+        self._index, self._map, self._stamp = {}, None, stamp
+        if stamp is None:
+            return
+
+        index = read_index(self.index_path)
+        if not index.clips:
+            return
+        try:
+            with open(self.data_path, 'rb') as f:
+                # 說明：資料檔必須是索引記錄的那一個 (重建換檔後、新索引寫入前的瞬間會不一致)
+                # Description: The data file must be the one the index was written for
+                # (they disagree briefly during a rebuild, between the data swap and the new index)
+                if (os.fstat(f.fileno()).st_size < index.data_size
+                        or data_digest(f, index.data_size) != index.data_sha256):
+                    logging.warning(f"Audio pack {self.data_path} does not match its index; ignoring it")
+                    return
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not map audio pack {self.data_path}: {e}")
+            return
+        self._index = index.clips
+
+    def get(self, text: str) -> Optional[bytes]:
+        """取得封裝檔中的語音；沒有時回傳 None (Return a clip from the pack, or None)"""
+        with self._lock:
+            self._refresh()
+            pos = self._index.get(text)
+            if pos is None:
+                return None
+            offset, length = pos
+            return self._map[offset:offset + length]
+
+    def contains(self, text: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return text in self._index
+
+_pack: Optional[AudioPack] = None
+_pack_lock = threading.Lock()
+
+def get_pack() -> AudioPack:
+    """取得全程式共用的語音封裝檔 (Return the process-wide audio pack)"""
+    global _pack
+    if _pack is None:
+        with _pack_lock:
+            if _pack is None:
+                _pack = AudioPack(config.AUDIO_PACK_FILE, config.AUDIO_PACK_INDEX)
+    return _pack
@@ -1,16 +1,29 @@
 # Service for Audio/TTS operations
 # 音訊處理服務
 
-import requests
+import os
 import base64
-from urllib.parse import quote
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional
 import streamlit.components.v1 as components
 import logging
+from app.core import config, logging_setup
+from app.services import audio_cache, audio_pack, tts_client
+
+# 說明：所有 session 共用的背景下載執行緒
+# Description: Background download pool shared by all sessions
+_prefetch_pool = ThreadPoolExecutor(max_workers=config.AUDIO_PREFETCH_WORKERS, thread_name_prefix="tts-prefetch")
+
+# 說明：進行中的下載 (text -> Future)，同一個字同時只下載一次，其他請求等待同一個結果
+# Description: In-flight fetches (text -> Future); concurrent requests for a word share one download
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
 
 def get_audio_bytes_from_google_tts(text: str) -> bytes:
     """
-    從 Google Translate TTS 下載音頻字節。
-    Fetch audio bytes from Google TTS.
+    從 Google Translate TTS 下載音頻字節 (經由共用連線池與斷路器)。
+    Fetch audio bytes from Google TTS through the pooled, circuit-broken client.
 
     Args:
         text: Text to speak
@@ -18,55 +31,196 @@ def get_audio_bytes_from_google_tts(text: str) -> bytes:
     Returns:
         Audio bytes or None
     """
+    return tts_client.get_client().fetch(text)
+
+def local_asset_path(text: str) -> Optional[str]:
+    """
+    預先產生的生字語音路徑：優先使用壓縮版 (audio/compact/vocab/<字>.mp3)，
+    再用原始檔 (audio/vocab/<字>.mp3)；都不存在時回傳 None。
+    Path of the pre-generated audio for a word, preferring the compact variant;
+    None if there is none.
+    """
+    if not text or os.sep in text or '/' in text or text.startswith('.'):
+        return None
+    return _first_existing(config.COMPACT_VOCAB_AUDIO_DIR, config.VOCAB_AUDIO_DIR, f"{text}.mp3")
+
+def _first_existing(compact_dir: str, original_dir: str, filename: str) -> Optional[str]:
+    """先找壓縮版，再找原始檔 (Prefer the compact variant over the original)"""
+    for directory in (compact_dir, original_dir):
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def has_local_audio(text: str) -> bool:
+    """是否有預先產生的語音 (封裝檔或個別檔案)"""
+    return audio_pack.get_pack().contains(text) or local_asset_path(text) is not None
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read() or None
+    except OSError as e:
+        logging.warning(f"Could not read audio file {path}: {e}")
+        return None
+
+def get_audio_bytes(text: str) -> Optional[bytes]:
+    """
+    取得語音：語音封裝檔 → 預先產生的語音檔 → 記憶體/磁碟快取 → 線上語音 (下載後寫入快取)。
+    Return audio bytes from the audio pack, then the loose local assets, then the
+    memory/disk cache, and only then from live TTS (caching the result).
+    (Regenerated clips reach the pack on the next pack_audio_assets.py run, which repacks changed clips.)
+    """
+    audio_bytes = audio_pack.get_pack().get(text)
+    if audio_bytes:
+        return audio_bytes
+
+    path = local_asset_path(text)
+    if path is not None:
+        audio_bytes = _read_file(path)
+        if audio_bytes:
+            return audio_bytes
+
+    audio_bytes = audio_cache.get_cache().get(text, config.TTS_LANG)
+    if audio_bytes is not None:
+        return audio_bytes
+
+    future, _ = _claim(text)
+    # 說明：登記的下載還沒開始 (例如預先下載仍在排隊) 時直接在這裡下載，不等其他 session 的請求
+    # Description: If the claimed fetch has not started (e.g. a prefetch still queued behind other
+    #              sessions' requests), run it inline instead of waiting for the pool
+    if _start(future):
+        return _fetch(text, future)
+    # 說明：下載已在進行中，最多等 AUDIO_WAIT_SECONDS，逾時就這次不播放
+    # Description: The fetch is already running; wait at most AUDIO_WAIT_SECONDS, else play nothing this time
+    try:
+        return future.result(timeout=config.AUDIO_WAIT_SECONDS)
+    except FutureTimeoutError:
+        logging.warning(f"Timed out waiting for audio of {text}")
+        return None
+
+def _claim(text: str):
+    """
+    登記一個下載：已有進行中的下載時回傳 (該 Future, False)，否則回傳 (新 Future, True)。
+    取得 Future 的一方以 _start 搶到執行權後呼叫 _fetch 完成它。
+    Register a fetch: returns (existing future, False) if one is in flight,
+    otherwise (new future, True). Whoever wins _start on the future runs _fetch.
+    """
+    with _inflight_lock:
+        future = _inflight.get(text)
+        if future is not None:
+            return future, False
+        future = Future()
+        _inflight[text] = future
+        return future, True
+
+def _start(future: Future) -> bool:
+    """搶下執行權 (只有一個呼叫者會得到 True) (Claim the right to run the fetch; exactly one caller wins)"""
+    with _inflight_lock:
+        if future.running() or future.done():
+            return False
+        return future.set_running_or_notify_cancel()
+
+def _prefetch(text: str, future: Future) -> None:
+    """背景執行緒：前景尚未接手時才下載 (Pool task: fetch unless the foreground already took over)"""
+    if _start(future):
+        _fetch(text, future)
+
+def _fetch(text: str, future: Future) -> Optional[bytes]:
+    """下載語音並寫入快取，完成登記的 Future (Fetch, cache, and resolve the claimed future)"""
+    audio_bytes = None
     try:
-        encoded_text = quote(text)
-        url = f"https://translate.google.com/translate_tts?ie=UTF-8&tl=zh-TW&client=tw-ob&q={encoded_text}"
-        
-        # 添加 User-Agent 避免被阻擋
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=5)
-        
-        if response.status_code == 200:
-            return response.content
-        else:
-            return None
-    except Exception as e:
-        logging.error(f"TTS Error: {e}")
+        cache = audio_cache.get_cache()
+        # 說明：登記前可能剛好有另一個下載完成並寫入快取
+        # Description: Another fetch may have finished between our cache miss and the claim
+        audio_bytes = cache.get(text, config.TTS_LANG)
+        if audio_bytes is None:
+            audio_bytes = get_audio_bytes_from_google_tts(text)
+            if audio_bytes:
+                cache.put(text, config.TTS_LANG, audio_bytes)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(text, None)
+        future.set_result(audio_bytes)
+    return audio_bytes
+
+def get_praise_audio(praise: Dict[str, str]) -> Optional[bytes]:
+    """
+    取得稱讚語音 (優先使用壓縮版)；沒有預先產生時回傳 None，不走網路。
+    Return the pre-generated praise clip (compact variant first), or None; never goes to the network.
+    """
+    filename = praise.get('filename')
+    if not filename:
         return None
+    path = _first_existing(config.COMPACT_PRAISE_AUDIO_DIR, config.PRAISE_AUDIO_DIR, f"{filename}.mp3")
+    return _read_file(path) if path is not None else None
+
+def prefetch_audio(text: str) -> None:
+    """
+    在背景預先下載語音 (已有語音檔、已在快取中或已在下載中時略過)。
+    同一個字同時只會下載一次：之後答題時 get_audio_bytes 會等待這個下載，而不會再送出請求。
+    Warm the audio cache in the background; no-op if a local asset, a cache entry
+    or an in-flight fetch exists. A later get_audio_bytes joins this fetch instead
+    of sending a second request.
+    """
+    if has_local_audio(text) or audio_cache.get_cache().contains(text, config.TTS_LANG):
+        return
+    future, owner = _claim(text)
+    if owner:
+        _prefetch_pool.submit(_prefetch, text, future)
 
-def generate_audio_html(text: str) -> None:
+def generate_audio_html(text: str, praise: Optional[Dict[str, str]] = None) -> None:
     """
-    在 Streamlit 中生成隱藏的 Audio 播放器 HTML (支援 iOS)。
-    Generate hidden HTML audio player for Streamlit (iOS compatible).
+    在 Streamlit 中生成隱藏的 Audio 播放器 HTML (支援 iOS)；有稱讚語音時先播稱讚再唸字。
+    Generate hidden HTML audio player for Streamlit (iOS compatible). When a praise
+    is given and its clip exists, it plays first, followed by the word.
     
     Args:
         text: Text to speak
+        praise: Entry of config.PRAISES to play before the word (optional)
     """
+    clips = []
+    if praise is not None:
+        praise_bytes = get_praise_audio(praise)
+        if praise_bytes:
+            clips.append(praise_bytes)
+
     # 獲取音頻字節
-    audio_bytes = get_audio_bytes_from_google_tts(text)
+    with logging_setup.log_latency("tts_fetch", level=logging.INFO):
+        audio_bytes = get_audio_bytes(text)
     
-    if not audio_bytes:
+    if audio_bytes:
+        clips.append(audio_bytes)
+    else:
         logging.warning("TTS generation failed")
+    if not clips:
         return
     
     # 轉換為 base64
-    audio_base64 = base64.b64encode(audio_bytes).decode()
+    sources = ", ".join(f'"data:audio/mp3;base64,{base64.b64encode(clip).decode()}"' for clip in clips)
     
-    # 使用 HTML5 Audio API 播放
+    # 使用 HTML5 Audio API 依序播放
     html_code = f"""
     <div style="text-align: center; padding: 10px; display: none;">
         <audio id="audioPlayer" controls autoplay style="width: 100%; max-width: 500px;">
-            <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
             您的瀏覽器不支援音頻播放
         </audio>
     </div>
     <script>
-        // 確保音頻能在 iOS 上播放
-        // Ensure audio plays on iOS
+        // 確保音頻能在 iOS 上播放，並依序播放每一段
+        // Ensure audio plays on iOS and play the clips one after another
+        const clips = [{sources}];
         const audio = document.getElementById('audioPlayer');
-        if (audio) {{
+        let next = 0;
+        function playNext() {{
+            if (!audio || next >= clips.length) return;
+            audio.src = clips[next++];
             audio.play().catch(e => console.log('Autoplay prevented:', e));
         }}
+        if (audio) {{
+            audio.addEventListener('ended', playNext);
+            playNext();
+        }}
     </script>
     """
     
@@ -2,18 +2,141 @@
 # 遊戲邏輯服務
 
 import random
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Sequence, Tuple, Optional
 from app.core import config
-from app.models.vocabulary import VocabItem, MemoryCard
+from app.models.vocabulary import VocabEntry, MemoryCard, MemoryBoard
+from app.services.review_scheduler import ReviewScheduler
+from app.services.weighted_sampler import MistakeWeightedSampler
 
-def get_question(db: List[VocabItem], full_db: Optional[List[VocabItem]]) -> Tuple[Optional[VocabItem], Optional[List[VocabItem]], Optional[int]]:
+def iter_random_indices(n: int, rng=random) -> Iterator[int]:
     """
-    從題庫中隨機產生題目。
-    Generate a random question from the database.
+    以稀疏 Fisher-Yates 洗牌逐一產生 0..n-1 的隨機排列 (每次 O(1)，不重複)。
+    Lazily yield a random permutation of range(n) via a sparse Fisher-Yates shuffle (O(1) per draw).
+    """
+    swapped: Dict[int, int] = {}
+    for i in range(n):
+        j = rng.randrange(i, n)
+        yield swapped.get(j, j)
+        swapped[j] = swapped.get(i, i)
+
+class ShuffleBag:
+    """
+    不重複的出題順序 (shuffle bag)：每一輪把目前題庫的每個字都出過一次才重新洗牌。
+    每一輪直接沿用題庫的索引陣列，以稀疏 Fisher-Yates 逐一抽出 (每次 O(1))；
+    題庫縮小時 (錯題複習答對後移除) 略過已不在題庫中的字。
+    抽到的字剛好是上一題 (例如新一輪的第一個字) 時延後一題，避免同一個字連續出現。
+
+    Non-repeating question order: every word in the db is asked once per epoch
+    before the bag is reshuffled. An epoch draws lazily from the db's index array
+    with a sparse Fisher-Yates shuffle (O(1) per draw) and skips words that have
+    left a shrinking db. A word equal to the previous target is deferred by one
+    draw so the same word never appears twice in a row.
+    """
+    __slots__ = ('_order', '_positions', '_deferred', 'last')
+
+    def __init__(self):
+        self._order = None
+        self._positions: Iterator[int] = iter(())
+        self._deferred: Optional[int] = None
+        self.last: Optional[VocabEntry] = None
+
+    def _next(self, db: Sequence[VocabEntry], rng) -> int:
+        """取出下一個仍在題庫中的索引，這一輪用完時重新洗牌 (db 不可為空)"""
+        deferred, self._deferred = self._deferred, None
+        if deferred is not None and db.contains_index(deferred):
+            return deferred
+        while True:
+            position = next(self._positions, None)
+            if position is None:
+                self._order = db.indices
+                self._positions = iter_random_indices(len(self._order), rng)
+                continue
+            index = self._order[position]
+            if db.contains_index(index):
+                return index
+
+    def draw(self, db: Sequence[VocabEntry], rng=random) -> Optional[VocabEntry]:
+        """
+        抽出下一個字；題庫為空時回傳 None。
+        Draw the next word, or None if db is empty.
+        """
+        if not db:
+            return None
+        index = self._next(db, rng)
+        if db.items[index] is self.last and len(db) > 1:
+            self._deferred, index = index, self._next(db, rng)
+        self.last = db.items[index]
+        return self.last
+
+def pick_distractors(target: VocabEntry, db: Sequence[VocabEntry], full_db: Optional[Sequence[VocabEntry]], count: int, label: str = 'char', rng=random) -> List[VocabEntry]:
+    """
+    抽取干擾項：先從注音相似索引抽「聽起來很像」的字，不足時再不重複隨機抽樣，
+    目前題庫不足時再從完整題庫補足。選項的字與顯示文字 (label) 都不會重複。
+    Pick distractors: similar-sounding words from the phonetic index first, then sampling
+    without replacement from db, then from full_db. Options never repeat a char or a label.
+
+    Only fewer than `count` are returned when both sources together have fewer distinct words.
+    """
+    distractors: List[VocabEntry] = []
+    seen_chars = {target['char']}
+    seen_labels = {target[label]}
+
+    def try_add(item: VocabEntry) -> bool:
+        if item['char'] in seen_chars or item[label] in seen_labels:
+            return False
+        seen_chars.add(item['char'])
+        seen_labels.add(item[label])
+        distractors.append(item)
+        return len(distractors) == count
+
+    # 1. 注音相似的干擾項 (限定在目前題庫範圍內)
+    #    Similar-sounding distractors, limited to the current db
+    phonetic = getattr(full_db, 'phonetic_index', None) if config.USE_PHONETIC_DISTRACTORS else None
+    target_index = full_db.char_index.get(target['char']) if phonetic is not None else None
+    if target_index is not None and hasattr(db, 'contains_index'):
+        for _ in range(config.PHONETIC_DRAW_ATTEMPTS * count):
+            index = phonetic.draw_similar(target_index, rng)
+            if index is None:
+                break
+            if db.contains_index(index) and try_add(full_db[index]):
+                return distractors
+
+    # 2. 不重複隨機抽樣 (Uniform sampling without replacement)
+    for source in (db, full_db):
+        if not source:
+            continue
+        for index in iter_random_indices(len(source), rng):
+            if try_add(source[index]):
+                return distractors
+    return distractors
+
+def next_scheduled(db: Sequence[VocabEntry], full_db: Sequence[VocabEntry], scheduler: ReviewScheduler) -> Optional[VocabEntry]:
+    """
+    從複習排程取出最早到期、且仍在目前題庫中的字。
+    Pop the earliest-due word from the review scheduler that is still in db.
+    """
+    while True:
+        char = scheduler.next_due()
+        if char is None:
+            return None
+        index = full_db.char_index.get(char)
+        if index is not None and db.contains_index(index):
+            return full_db[index]
+
+def get_question(db: Sequence[VocabEntry], full_db: Optional[Sequence[VocabEntry]], scheduler: Optional[ReviewScheduler] = None, rng=random, sampler: Optional[MistakeWeightedSampler] = None, bag: Optional[ShuffleBag] = None) -> Tuple[Optional[VocabEntry], Optional[List[VocabEntry]], Optional[int]]:
+    """
+    從題庫中產生題目：錯題複習時依間隔複習排程挑選最早到期的字；
+    其他模式依 shuffle bag 的順序出題，並依錯題權重穿插常答錯的字加強練習。
+    Generate a question: the earliest-due word when a review scheduler is given, otherwise
+    the next word from the shuffle bag, interleaved with mistake-weighted reinforcement draws.
     
     Args:
-        db: Current working database
-        full_db: Full database for distractor generation
+        db: Current working database (a VocabSlice of the shared table)
+        full_db: Full database for distractor generation (the shared VocabularyTable)
+        scheduler: Review-mode scheduler (None for random selection)
+        rng: Random source (a seeded random.Random per session for replay)
+        sampler: Mistake-weighted reinforcement sampler (None to disable)
+        bag: Per-session shuffle bag (None for uniform selection)
         
     Returns:
         (target, options, mode) tuple
@@ -21,34 +144,37 @@ def get_question(db: List[VocabItem], full_db: Optional[List[VocabItem]]) -> Tup
     if not db:
         return None, None, None
 
-    target = random.choice(db)
-    options = [target]
-    
-    # Randomly select distractors
-    attempts = 0
-    source_db = db
-    
-    # If current db is too small, use full_db for distractors
-    if len(db) < config.NUM_OPTIONS and full_db and len(full_db) >= config.NUM_OPTIONS:
-        source_db = full_db
-
-    while len(options) < config.NUM_OPTIONS and attempts < config.MAX_DISTRACTOR_ATTEMPTS:
-        distractor = random.choice(source_db)
-        if distractor['char'] != target['char'] and distractor not in options:
-            options.append(distractor)
-        attempts += 1
-    
-    random.shuffle(options)
-    
+    target = None
+    if scheduler is not None:
+        target = next_scheduled(db, full_db, scheduler)
+    else:
+        if sampler is not None:
+            target = sampler.draw_reinforcement(rng)
+            if bag is not None and target is bag.last:
+                target = None
+        if bag is not None:
+            if target is None:
+                target = bag.draw(db, rng)
+            else:
+                bag.last = target
+    if target is None:
+        target = rng.choice(db)
+
     # Mode: 1=Char->Zhuyin, 2=Zhuyin->Char
-    mode = random.choice([1, 2]) 
+    mode = rng.choice([1, 2])
+
+    # 看字選注音時選項顯示注音，看注音選字時顯示字
+    label = 'zhuyin' if mode == 1 else 'char'
+    options = [target] + pick_distractors(target, db, full_db, config.NUM_OPTIONS - 1, label, rng)
+    
+    rng.shuffle(options)
     
     return target, options, mode
 
-def init_memory_game_cards(db: List[VocabItem]) -> List[MemoryCard]:
+def init_memory_game_cards(db: Sequence[VocabEntry], rng=random) -> MemoryBoard:
     """
-    初始化記憶配對遊戲卡片。
-    Initialize memory game cards.
+    初始化記憶配對遊戲盤面。
+    Initialize the memory game board.
     """
     num_pairs = config.MEMORY_GAME_PAIRS
     
@@ -56,42 +182,12 @@ def init_memory_game_cards(db: List[VocabItem]) -> List[MemoryCard]:
         selected_words = db
         # Optional: Duplicate if needed, but for now just use available
     else:
-        selected_words = random.sample(db, num_pairs)
+        selected_words = rng.sample(db, num_pairs)
     
     cards: List[MemoryCard] = []
     for i, word in enumerate(selected_words):
-        # Card 1: Char
-        cards.append({
-            'id': i * 2,
-            'content': word['char'],
-            'type': 'char',
-            'pair_id': i,
-            'is_matched': False,
-            'is_flipped': False
-        })
-        # Card 2: Zhuyin
-        cards.append({
-            'id': i * 2 + 1,
-            'content': word['zhuyin'],
-            'type': 'zhuyin',
-            'pair_id': i,
-            'is_matched': False,
-            'is_flipped': False
-        })
-    
-    random.shuffle(cards)
-    return cards
-
-def check_memory_match(cards: List[MemoryCard], flipped_indices: List[int]) -> bool:
-    """
-    檢查兩張翻開的卡片是否配對。
-    Check if two flipped cards match.
-    """
-    if len(flipped_indices) != 2:
-        return False
-        
-    idx1, idx2 = flipped_indices
-    card1 = cards[idx1]
-    card2 = cards[idx2]
+        cards.append(MemoryCard(i * 2, word['char'], 'char', i))         # Card 1: Char
+        cards.append(MemoryCard(i * 2 + 1, word['zhuyin'], 'zhuyin', i))  # Card 2: Zhuyin
     
-    return card1['pair_id'] == card2['pair_id']
+    rng.shuffle(cards)
+    return MemoryBoard(cards)
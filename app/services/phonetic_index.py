@@ -0,0 +1,207 @@
+# Zhuyin similarity index for hard distractors
+# 注音相似度索引 (產生「聽起來很像」的干擾項)
+
+import random
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models.vocabulary import VocabEntry
+
+INITIALS = 'ㄅㄆㄇㄈㄉㄊㄋㄌㄍㄎㄏㄐㄑㄒㄓㄔㄕㄖㄗㄘㄙ'
+MEDIALS = 'ㄧㄨㄩ'
+FINALS = 'ㄚㄛㄜㄝㄞㄟㄠㄡㄢㄣㄤㄥㄦ'
+TONE_MARKS = 'ˊˇˋ'
+FIRST_TONE = 'ˉ'
+NEUTRAL_TONE = '˙'
+
+# 說明：音節內的位置 (聲母 < 介音 < 韻母)，遇到不能接在後面的符號就開始新音節
+# Description: Position inside a syllable; a symbol that cannot follow the current one starts a new syllable
+_STAGE = {**{s: 1 for s in INITIALS}, **{s: 2 for s in MEDIALS}, **{s: 3 for s in FINALS}}
+
+# 說明：替換桶的萬用字元 (不會出現在注音中)
+# Description: Wildcard for substitution buckets (never appears in zhuyin)
+WILDCARD = '?'
+
+def _normalize_syllable(symbols: List[str], neutral: bool) -> str:
+    """一聲符號省略，輕聲符號放在音節最後"""
+    syllable = ''.join(s for s in symbols if s != FIRST_TONE)
+    return syllable + NEUTRAL_TONE if neutral else syllable
+
+def split_syllables(zhuyin: str) -> List[str]:
+    """
+    把注音拆成音節並統一寫法：一聲符號省略，輕聲符號一律放在該音節最後。
+    有空白時以空白分隔；沒有空白時依聲母/介音/韻母/聲調的順序判斷音節邊界，
+    音節開頭的輕聲符號屬於後一個音節，緊接在音節後面的屬於前一個音節 (本資料的寫法)。
+
+    Split zhuyin into normalized syllables: the first-tone mark is dropped and the
+    neutral-tone dot always goes at the end of its syllable. Spaces separate
+    syllables when present; otherwise boundaries follow the initial/medial/final/tone
+    order. A dot before a syllable belongs to it, a dot right after one to that one
+    (the convention of this vocabulary file).
+    """
+    syllables: List[str] = []
+    symbols: List[str] = []
+    neutral = False
+    stage = 0
+
+    def close() -> None:
+        nonlocal neutral, stage
+        if symbols:
+            syllables.append(_normalize_syllable(symbols, neutral))
+            symbols.clear()
+            neutral = False
+        stage = 0
+
+    for symbol in zhuyin:
+        if symbol.isspace():
+            close()
+        elif symbol == NEUTRAL_TONE:
+            if symbols:
+                neutral = True
+                close()
+            else:
+                neutral = True
+        elif symbol in TONE_MARKS or symbol == FIRST_TONE:
+            symbols.append(symbol)
+            close()
+        else:
+            position = _STAGE.get(symbol, stage)
+            if symbols and position <= stage:
+                close()
+            symbols.append(symbol)
+            stage = position
+    close()
+    return syllables
+
+def normalize_zhuyin(zhuyin: str) -> str:
+    """
+    統一注音寫法 (音節之間以一個空白分隔)。
+    Normalize a zhuyin string; syllables are joined by single spaces.
+    """
+    return ' '.join(split_syllables(zhuyin))
+
+class PhoneticIndex:
+    """
+    每次載入生字表時建立一次的注音相似度索引。
+    Zhuyin similarity index, built once per vocabulary load.
+
+    兩個讀音相似 = 音節數相同，只有一個音節不同，且該音節的注音符號編輯距離為 1
+    (換聲母、換韻母、多/少介音、換聲調)。相似讀音不逐對列出，而是依「其他音節 + 該音節
+    換掉一個符號 / 刪掉一個符號」分桶，建立時間與總符號數成正比。
+    抽取干擾項時先隨機選一個桶，再從桶中選一個讀音、從該讀音的生字中選一個，皆為 O(1)。
+
+    Two readings are similar when they have the same number of syllables and differ
+    in exactly one syllable, by one bopomofo edit (swapped initial or final,
+    added/dropped medial, changed tone). Similar readings are never listed pairwise:
+    each reading is filed into buckets keyed by the other syllables plus the varying
+    syllable with one symbol wildcarded or deleted, so the build is linear in the
+    total number of symbols. A draw picks one of the reading's buckets, a reading in
+    it and an entry with that reading, all O(1).
+    """
+    __slots__ = ('entry_syllable', 'syllable_entries', 'buckets', 'refs')
+
+    def __init__(self, items: Sequence[VocabEntry]):
+        syllable_ids: Dict[str, int] = {}
+        self.entry_syllable = array('I')
+        self.syllable_entries: List[array] = []
+        for i, entry in enumerate(items):
+            key = normalize_zhuyin(entry.zhuyin)
+            sid = syllable_ids.setdefault(key, len(syllable_ids))
+            if sid == len(self.syllable_entries):
+                self.syllable_entries.append(array('I'))
+            self.syllable_entries[sid].append(i)
+            self.entry_syllable.append(sid)
+
+        # 說明：對每個讀音的每個音節，列出換掉一個符號 (萬用字元) 與刪掉一個符號的變體，
+        #       其他音節保持原樣，所以音節數固定；單一音節的變體依音節快取 (不同音節不多)
+        # Description: For every syllable of every reading, list its one-symbol-wildcarded and
+        #              one-symbol-deleted variants with the other syllables kept, so the syllable
+        #              count is fixed; per-syllable variants are cached (there are few distinct syllables)
+        local_variants: Dict[str, Tuple[List[str], List[str]]] = {}
+        substitutions: List[List[str]] = []
+        deletions: List[List[str]] = []
+        sub_groups: Dict[str, List[int]] = {}
+        by_deletion: Dict[str, List[int]] = {}
+        for sid, key in enumerate(syllable_ids):
+            syllables = key.split(' ')
+            subs: List[str] = []
+            dels: List[str] = []
+            for p, syllable in enumerate(syllables):
+                local = local_variants.get(syllable)
+                if local is None:
+                    local = local_variants[syllable] = (
+                        [syllable[:i] + WILDCARD + syllable[i + 1:] for i in range(len(syllable))],
+                        # 刪掉音節唯一的符號會讓音節消失，不算 (Deleting a whole syllable is not an edit)
+                        sorted({syllable[:i] + syllable[i + 1:] for i in range(len(syllable))} - {''}),
+                    )
+                before = ' '.join(syllables[:p] + ['']) if p else ''
+                after = ' '.join([''] + syllables[p + 1:]) if p + 1 < len(syllables) else ''
+                subs.extend(before + v + after for v in local[0])
+                dels.extend(before + v + after for v in local[1])
+            for variant in subs:
+                sub_groups.setdefault(variant, []).append(sid)
+            for variant in dels:
+                by_deletion.setdefault(variant, []).append(sid)
+            substitutions.append(subs)
+            deletions.append(dels)
+
+        # 說明：每個讀音的候選來源 (refs)：
+        #       偶數 2*b   = 替換桶 b (包含自己)
+        #       奇數 2*b+1 = 插入桶 b (刪掉一個符號後等於自己的讀音，不含自己)
+        #       負數 -(s+1) = 刪掉一個符號後的讀音 s
+        # Description: Candidate sources per reading (refs):
+        #              even 2*b   = substitution bucket b (contains the reading itself)
+        #              odd  2*b+1 = insertion bucket b (readings that delete down to this one)
+        #              negative -(s+1) = the reading s obtained by deleting one symbol
+        self.buckets: List[array] = []
+        bucket_ids: Dict[str, int] = {}
+        insertion_ids: Dict[str, int] = {}
+        self.refs: List[array] = []
+        for sid, key in enumerate(syllable_ids):
+            refs = array('i')
+            for variant in substitutions[sid]:
+                group = sub_groups[variant]
+                if len(group) > 1:
+                    bid = bucket_ids.get(variant)
+                    if bid is None:
+                        bid = bucket_ids[variant] = len(self.buckets)
+                        self.buckets.append(array('I', group))
+                    refs.append(2 * bid)
+            for variant in deletions[sid]:
+                other = syllable_ids.get(variant)
+                if other is not None:
+                    refs.append(-(other + 1))
+            parents = by_deletion.get(key)
+            if parents is not None:
+                bid = insertion_ids.get(key)
+                if bid is None:
+                    bid = insertion_ids[key] = len(self.buckets)
+                    self.buckets.append(array('I', parents))
+                refs.append(2 * bid + 1)
+            self.refs.append(refs)
+
+    def draw_similar(self, entry_index: int, rng=random) -> Optional[int]:
+        """
+        隨機抽一個與指定生字讀音相似的生字索引 (O(1))；沒有相似讀音時回傳 None。
+        Draw the index of an entry whose zhuyin is similar to the given entry's, in O(1).
+        """
+        sid = self.entry_syllable[entry_index]
+        refs = self.refs[sid]
+        if not refs:
+            return None
+        ref = refs[rng.randrange(len(refs))]
+        if ref < 0:
+            other = -ref - 1
+        else:
+            bucket = self.buckets[ref >> 1]
+            if ref & 1:
+                other = bucket[rng.randrange(len(bucket))]
+            else:
+                # 說明：替換桶包含自己，從其他成員中均勻抽取 (抽到自己時換成最後一個)
+                # Description: Substitution buckets contain the reading itself; draw uniformly among
+                #              the others (self is swapped for the last member)
+                other = bucket[rng.randrange(len(bucket) - 1)]
+                if other == sid:
+                    other = bucket[-1]
+        entries = self.syllable_entries[other]
+        return entries[rng.randrange(len(entries))]
@@ -0,0 +1,176 @@
+# Spaced-repetition scheduler for review mode
+# 錯題複習的間隔重複排程 (SM-2)，以到期時間的 heap 挑選下一題
+
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core import config
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+class CardState:
+    """
+    單一生字的複習狀態 (SM-2)。
+    Review state of one word (SM-2).
+    """
+    __slots__ = ('ease', 'interval', 'repetitions', 'due')
+
+    def __init__(self, ease: float = config.SRS_INITIAL_EASE, interval: float = 0.0, repetitions: int = 0, due: float = 0.0):
+        self.ease = ease                # 難易度係數 (ease factor)
+        self.interval = interval        # 間隔天數 (interval in days)
+        self.repetitions = repetitions  # 連續答對次數 (consecutive correct answers)
+        self.due = due                  # 下次到期時間 (epoch seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'ease': self.ease, 'interval': self.interval, 'repetitions': self.repetitions, 'due': self.due}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, float]) -> 'CardState':
+        return cls(float(data['ease']), float(data['interval']), int(data['repetitions']), float(data['due']))
+
+class ReviewScheduler:
+    """
+    間隔重複排程器：每個字保存 ease / interval / due，
+    以 (due, seq, char) 的最小 heap 取出下一題，O(log n)。
+    過期的 heap 項目 (同一個字被重新排程或移出本次複習) 以延遲刪除處理。
+
+    Spaced-repetition scheduler. Each word keeps ease, interval and due time,
+    and the next item comes from a min-heap keyed by (due, seq, char) in O(log n).
+    Superseded heap entries are dropped lazily when they reach the top.
+    """
+
+    def __init__(self, cards: Optional[Dict[str, CardState]] = None):
+        self.cards: Dict[str, CardState] = cards or {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._latest_seq: Dict[str, int] = {}
+        self._seq = 0
+        self.dirty = False
+
+    # ------------------------------------------
+    # 持久化 (Persistence)
+    # ------------------------------------------
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {char: card.to_dict() for char, card in self.cards.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, float]]) -> 'ReviewScheduler':
+        return cls({char: CardState.from_dict(card) for char, card in data.items()})
+
+    # ------------------------------------------
+    # 佇列 (Queue)
+    # ------------------------------------------
+    def track(self, char: str, now: Optional[float] = None) -> CardState:
+        """開始追蹤一個字 (新字立即到期)"""
+        card = self.cards.get(char)
+        if card is None:
+            card = self.cards[char] = CardState(due=now if now is not None else time.time())
+            self.dirty = True
+        return card
+
+    def _push(self, char: str) -> None:
+        self._seq += 1
+        self._latest_seq[char] = self._seq
+        heapq.heappush(self._heap, (self.cards[char].due, self._seq, char))
+
+    def build_queue(self, chars: Iterable[str], now: Optional[float] = None) -> None:
+        """
+        以本次要複習的字建立 heap (O(n))。
+        Build the heap for this review session in O(n).
+        """
+        now = now if now is not None else time.time()
+        self._heap = []
+        self._latest_seq = {}
+        for char in chars:
+            self.track(char, now)
+            self._seq += 1
+            self._latest_seq[char] = self._seq
+            self._heap.append((self.cards[char].due, self._seq, char))
+        heapq.heapify(self._heap)
+
+    def retain(self, chars: Iterable[str]) -> None:
+        """只保留仍在錯題本中的字 (其他字的狀態已無用)"""
+        keep = set(chars)
+        for char in [c for c in self.cards if c not in keep]:
+            self.forget(char)
+
+    def select_session(self, chars: Iterable[str], minimum: int, now: Optional[float] = None) -> List[str]:
+        """
+        挑出本次要複習的字：所有已到期的字；不足 minimum 時補上最快到期的字。
+        Choose the session's words: everything due, topped up with the soonest-due words.
+        """
+        now = now if now is not None else time.time()
+        ordered = sorted(dict.fromkeys(chars), key=lambda c: self.track(c, now).due)
+        due = [c for c in ordered if self.cards[c].due <= now]
+        if len(due) >= minimum:
+            return due
+        return ordered[:max(minimum, len(due))]
+
+    def next_due(self) -> Optional[str]:
+        """
+        取出最早到期的字 (O(log n))；佇列為空時回傳 None。
+        Pop the earliest-due word in O(log n), or None when the queue is empty.
+        """
+        while self._heap:
+            _, seq, char = heapq.heappop(self._heap)
+            if self._latest_seq.get(char) == seq:
+                del self._latest_seq[char]
+                return char
+        return None
+
+    def discard(self, char: str) -> None:
+        """將字移出本次複習佇列 (不影響保存的狀態)"""
+        self._latest_seq.pop(char, None)
+
+    def forget(self, char: str) -> None:
+        """完全移除某個字的複習狀態 (已畢業，從錯題本移除時使用)"""
+        self.discard(char)
+        if self.cards.pop(char, None) is not None:
+            self.dirty = True
+
+    # ------------------------------------------
+    # 評分 (Grading)
+    # ------------------------------------------
+    def record(self, char: str, correct: bool, now: Optional[float] = None, requeue: bool = True) -> CardState:
+        """
+        依 SM-2 更新狀態；答錯時在短暫延遲後重新排入本次佇列。
+        已答對過、尚未到期就提早複習 (例如為了補足最少題數) 時答對不推進間隔，
+        避免連續幾次複習就在幾分鐘內畢業。
+        Update the card with SM-2; wrong answers are requeued after a short relearn delay.
+        A correct answer on a card reviewed before it is due (e.g. a session top-up)
+        leaves its repetitions and interval unchanged, so back-to-back sessions cannot
+        graduate a word within minutes.
+        """
+        now = now if now is not None else time.time()
+        card = self.track(char, now)
+        quality = config.SRS_QUALITY_CORRECT if correct else config.SRS_QUALITY_WRONG
+
+        reviewed_early = quality >= 3 and card.repetitions > 0 and now < card.due
+        if quality < 3:
+            card.repetitions = 0
+            card.interval = 0.0
+            card.due = now + config.SRS_RELEARN_DELAY_SECONDS
+        elif not reviewed_early:
+            card.repetitions += 1
+            if card.repetitions == 1:
+                card.interval = 1.0
+            elif card.repetitions == 2:
+                card.interval = 6.0
+            else:
+                card.interval = round(card.interval * card.ease, 1)
+            card.due = now + card.interval * SECONDS_PER_DAY
+
+        if not reviewed_early:
+            card.ease = max(config.SRS_MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+            self.dirty = True
+
+        if requeue:
+            self._push(char)
+        else:
+            self.discard(char)
+        return card
+
+    def is_graduated(self, char: str) -> bool:
+        """間隔達到畢業門檻時視為已學會"""
+        card = self.cards.get(char)
+        return card is not None and card.interval >= config.SRS_GRADUATE_INTERVAL_DAYS
@@ -0,0 +1,191 @@
+# HTTP client for the live TTS fallback (pooled session + circuit breaker)
+# 線上語音的 HTTP 用戶端：共用連線池 (keep-alive)、斷路器、延遲與錯誤統計
+
+import time
+import atexit
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core import config
+
+BREAKER_CLOSED = 'closed'        # 正常送出請求
+BREAKER_OPEN = 'open'            # 連續失敗，暫停送出請求 (直接失敗)
+BREAKER_HALF_OPEN = 'half-open'  # 冷卻時間已過，只放行一個試探請求
+
+class CircuitBreaker:
+    """
+    斷路器：連續失敗達門檻後進入 open，冷卻期間內的請求直接失敗，不再等逾時；
+    冷卻時間過後進入 half-open，只放行一個試探請求，成功則恢復 closed，失敗則重新 open。
+
+    Circuit breaker: after `failure_threshold` consecutive failures it opens and
+    rejects calls immediately instead of waiting for timeouts. Once `reset_seconds`
+    have passed it goes half-open and lets a single probe through; a success closes
+    it again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否可以送出請求 (half-open 時只放行一個試探請求)"""
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_OPEN:
+                if self._clock() - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = BREAKER_HALF_OPEN
+                logging.info("TTS circuit breaker half-open, sending a probe")
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != BREAKER_CLOSED:
+                logging.info("TTS circuit breaker closed")
+            self.state = BREAKER_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != BREAKER_OPEN:
+                    logging.warning(f"TTS circuit breaker open for {self.reset_seconds:g}s after {self._failures} failures")
+                self.state = BREAKER_OPEN
+                self._opened_at = self._clock()
+
+class TTSStats:
+    """線上語音請求的統計 (延遲與錯誤計數)"""
+    __slots__ = ('requests', 'failures', 'rejected', 'total_latency_ms', 'max_latency_ms', '_lock')
+
+    def __init__(self):
+        self.requests = 0          # 實際送出的請求
+        self.failures = 0          # 逾時、連線錯誤或伺服器錯誤
+        self.rejected = 0          # 斷路器 open 時直接失敗的請求
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool) -> int:
+        """記錄一個請求，回傳目前的請求總數 (Record one request; returns the request count)"""
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failures += 1
+            self.total_latency_ms += latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            return self.requests
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'avg_latency_ms': self.total_latency_ms / self.requests if self.requests else 0.0,
+                'max_latency_ms': self.max_latency_ms,
+            }
+
+    def log(self, reason: str) -> None:
+        """把統計寫入日誌 (Log the counters)"""
+        s = self.snapshot()
+        logging.info(
+            f"TTS stats ({reason}): {s['requests']} requests, {s['failures']} failures, "
+            f"{s['rejected']} rejected, avg {s['avg_latency_ms']:.0f} ms, max {s['max_latency_ms']:.0f} ms"
+        )
+
+class TTSClient:
+    """
+    線上語音用戶端：所有 session 共用一個 requests.Session (keep-alive 連線池)，
+    請求經過斷路器，並記錄延遲與錯誤。
+    Live TTS client: one pooled keep-alive requests.Session shared by all sessions,
+    guarded by a circuit breaker, with latency/error counters.
+    """
+
+    def __init__(self, url: str, breaker: CircuitBreaker, pool_size: int, timeout):
+        self.url = url
+        self.breaker = breaker
+        self.timeout = timeout
+        self.stats = TTSStats()
+        self.session = requests.Session()
+        # 說明：不自動重試 (斷路器負責處理失敗)；連線池大小配合同時下載的執行緒數
+        # Description: No automatic retries (the breaker handles failures); the pool matches the download threads
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 添加 User-Agent 避免被阻擋
+        self.session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+    def fetch(self, text: str) -> Optional[bytes]:
+        """
+        下載一段語音；斷路器 open、逾時或伺服器錯誤時回傳 None。
+        Fetch one clip; None when the breaker is open or the request fails.
+        """
+        if not self.breaker.allow():
+            self.stats.record_rejected()
+            return None
+
+        params = {'ie': 'UTF-8', 'tl': config.TTS_LANG, 'client': 'tw-ob', 'q': text}
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            # 說明：只有伺服器端錯誤 (5xx、429) 算失敗；其他非 200 只代表這個字沒有語音
+            # Description: Only upstream trouble (5xx, 429) counts as a failure; other non-200s just mean no clip
+            ok = response.status_code < 500 and response.status_code != 429
+            if response.status_code == 200 and response.content:
+                return response.content
+            if not ok:
+                logging.warning(f"TTS upstream returned {response.status_code} for {text}")
+            return None
+        except requests.RequestException as e:
+            logging.error(f"TTS Error: {e}")
+            return None
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            count = self.stats.record(latency_ms, ok)
+            state = self.breaker.state
+            if ok:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            logging.debug("tts_request", extra={'latency_ms': f"{latency_ms:.1f}"})
+            if self.breaker.state != state:
+                self.stats.log(f"breaker {state} -> {self.breaker.state}")
+            elif count % config.TTS_STATS_LOG_EVERY == 0:
+                self.stats.log("periodic")
+
+_client: Optional[TTSClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> TTSClient:
+    """取得全程式共用的線上語音用戶端 (Return the process-wide TTS client)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                breaker = CircuitBreaker(config.TTS_BREAKER_FAILURES, config.TTS_BREAKER_RESET_SECONDS)
+                _client = TTSClient(config.TTS_URL, breaker, config.TTS_POOL_SIZE,
+                                    (config.TTS_CONNECT_TIMEOUT, config.TTS_READ_TIMEOUT))
+                atexit.register(_client.stats.log, "exit")
+    return _client
@@ -0,0 +1,134 @@
+# Mistake-weighted target sampling (Walker alias method)
+# 依答錯紀錄加權抽題 (Walker alias table，每次抽取 O(1))
+
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.core import config
+from app.models.vocabulary import MistakeItem, VocabEntry
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def parse_timestamp(timestamp: Optional[str]) -> Optional[float]:
+    """將錯題紀錄的時間字串轉成 epoch 秒數 (格式不符時回傳 None)"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+def mistake_weight(misses: int, last_missed: Optional[float], now: float) -> float:
+    """
+    錯題的額外權重：答錯次數 × 依最後答錯時間的半衰期衰減 (沒有時間時不衰減)。
+    Extra weight of a missed word: miss count decayed by the age of the last miss.
+    """
+    decay = 1.0
+    if last_missed is not None:
+        age_days = max(0.0, now - last_missed) / SECONDS_PER_DAY
+        decay = 0.5 ** (age_days / config.MISTAKE_HALF_LIFE_DAYS)
+    return config.MISTAKE_WEIGHT * misses * decay
+
+class AliasTable:
+    """
+    Walker/Vose alias table：建立 O(n)，抽取 O(1)。
+    Walker alias table (Vose's construction): O(n) build, O(1) draws.
+    """
+    __slots__ = ('prob', 'alias')
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩下的 (浮點誤差) 機率視為 1 (Leftovers are 1 up to rounding error)
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng=random) -> int:
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+class MistakeWeightedSampler:
+    """
+    題目加權抽樣：每個字的權重 = 1 + 錯題額外權重。
+    抽取時先依「全部字的基本權重總和 : 錯題額外權重總和」決定從哪一部分抽，
+    錯題部分使用 alias table (O(1))；基本部分由呼叫端處理 (shuffle bag 或均勻抽樣)。
+    答錯時只更新該字的權重並標記錯題部分需要重建；答錯後的下一次抽取會以
+    O(m) 重建錯題 alias table (m 為錯題數，通常很小)，不需重新掃描錯題紀錄。
+
+    Weighted target sampling where each word weighs 1 plus its mistake weight.
+    A draw first picks the base part or the mistake part in proportion to their
+    totals. The mistake part is an alias table over missed words (O(1)); the base
+    part is left to the caller (the shuffle bag, or a uniform draw).
+    Logging a mistake only updates that word and marks the mistake table dirty;
+    the next draw after a miss rebuilds that alias table in O(m), where m is the
+    number of missed words (usually small). The mistake log is never rescanned.
+    """
+    __slots__ = ('db', '_entries', '_misses', '_last_missed', '_weights', '_chars', '_table', '_extra_total', '_dirty')
+
+    def __init__(self, db: Sequence[VocabEntry], full_db, mistakes: Iterable[MistakeItem], now: Optional[float] = None):
+        self.db = db
+        self._entries: Dict[str, VocabEntry] = {}
+        self._misses: Dict[str, int] = {}
+        self._last_missed: Dict[str, Optional[float]] = {}
+        self._weights: Dict[str, float] = {}
+        self._chars: List[str] = []
+        self._table: Optional[AliasTable] = None
+        self._extra_total = 0.0
+        self._dirty = False
+
+        now = now if now is not None else time.time()
+        for item in mistakes:
+            index = full_db.char_index.get(item['char'])
+            if index is None or not db.contains_index(index):
+                continue
+            self._entries[item['char']] = full_db[index]
+            self._set(item['char'], item.get('misses') or 1, parse_timestamp(item.get('timestamp')), now)
+
+    def _set(self, char: str, misses: int, last_missed: Optional[float], now: float) -> None:
+        self._misses[char] = misses
+        self._last_missed[char] = last_missed
+        self._weights[char] = mistake_weight(misses, last_missed, now)
+        self._dirty = True
+
+    def record_miss(self, entry: VocabEntry, now: Optional[float] = None) -> None:
+        """答錯一次：提高該字的權重 (O(1)；下一次抽取時以 O(m) 重建錯題表)"""
+        char = entry['char']
+        now = now if now is not None else time.time()
+        self._entries[char] = entry
+        self._set(char, self._misses.get(char, 0) + 1, now, now)
+
+    def _rebuild(self) -> None:
+        self._chars = list(self._weights)
+        weights = [self._weights[c] for c in self._chars]
+        self._extra_total = sum(weights)
+        self._table = AliasTable(weights) if self._extra_total > 0 else None
+        self._dirty = False
+
+    def draw_reinforcement(self, rng=random) -> Optional[VocabEntry]:
+        """
+        依錯題額外權重佔總權重的比例，抽一個錯題加強練習 (O(1))；
+        落在基本部分時回傳 None，由呼叫端照一般順序出題。
+        Draw a missed word with probability extra / (base + extra), in O(1);
+        None means the base part was chosen and the caller picks the word.
+        """
+        if self._dirty:
+            self._rebuild()
+        if self._table is None or rng.random() * (len(self.db) + self._extra_total) < len(self.db):
+            return None
+        return self._entries[self._chars[self._table.draw(rng)]]
@@ -5,6 +5,18 @@ import os
 import streamlit as st
 from app.core import config
 
+MEMORY_CARD_STYLES = """
+<style>
+section.main .stButton button {
+    width: 100% !important;
+    height: 120px !important;
+    font-size: 32px !important;
+    margin-bottom: 10px !important;
+    border-radius: 12px !important;
+}
+</style>
+"""
+
 def load_custom_css() -> None:
     """
     載入自訂 CSS 樣式。
@@ -30,15 +42,6 @@ def inject_memory_card_styles() -> None:
     專門為記憶遊戲卡片注入的特殊樣式。
     Special styles for memory game cards.
     """
-    st.markdown("""
-    <style>
-    /* 強制設定主區域所有按鈕的寬度 (針對記憶遊戲) */
-    /* Force button width for memory game cards */
-    section.main .stButton button {
-        min-width: 540px !important;
-        width: 100% !important;
-        font-size: 48px !important;
-        height: 100px !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # 說明：針對卡片進行樣式優化，避免在大寬度下導致版面崩潰
+    # Description: Optimize card styles to prevent layout collapse on narrow screens
+    st.markdown(MEMORY_CARD_STYLES, unsafe_allow_html=True)
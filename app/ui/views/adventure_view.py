@@ -2,7 +2,6 @@
 # 勇者闖關模式介面
 
 import streamlit as st
-import random
 from app.core import config
 from app.ui.views.quiz_view import handle_answer, prepare_next_question
 from app.services import audio_service
@@ -34,7 +33,7 @@ def render_adventure_view():
 
     # 顯示目前怪物 (Show Monster)
     if not st.session_state.current_monster:
-        st.session_state.current_monster = random.choice(config.MONSTERS)
+        st.session_state.current_monster = st.session_state.rng.choice(config.MONSTERS)
     
     st.markdown(f"<div style='text-align: center; font-size: 100px;'>{st.session_state.current_monster}</div>", unsafe_allow_html=True)
 
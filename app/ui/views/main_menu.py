@@ -2,21 +2,8 @@
 # 主選單介面
 
 import streamlit as st
-from typing import List
 from app.core import config
-from app.repositories import vocab_repository
-
-def get_book_sort_key(book_name: str) -> int:
-    """自定義排序函式 (讓第一冊、第二冊...依序排列)"""
-    cn_map = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
-    try:
-        if book_name.startswith("第") and book_name.endswith("冊"):
-            num_str = book_name[1:-1]
-            if num_str in cn_map:
-                return cn_map[num_str]
-    except:
-        pass
-    return 100
+from app.repositories import vocab_store
 
 def render_main_menu(on_start_game):
     """
@@ -24,13 +11,19 @@ def render_main_menu(on_start_game):
     Render the main menu.
     """
     st.header("請選擇模式")
+
+    # 學生代號 (每位學生有自己的錯題本)
+    # 說明：輸入框離開畫面時 Streamlit 會清掉它的 key，所以另存到 learner_id
+    # Description: Widget keys are dropped when the widget is not rendered, so copy into learner_id
+    learner_id = st.text_input("👤 學生代號 (選填，用來保存自己的錯題本)", value=st.session_state.learner_id)
+    st.session_state.learner_id = learner_id.strip()
     
-    # 載入題庫
-    full_db = vocab_repository.load_vocabulary(config.VOCAB_FILE)
-    st.session_state.full_db = full_db
+    # 載入題庫 (共用快取，檔案變動時才重新讀取)
+    table = vocab_store.get_vocabulary(config.VOCAB_FILE)
+    st.session_state.full_db = table
     
-    # 取得排序後的冊別
-    all_books = sorted(list(set(item['book'] for item in full_db)), key=get_book_sort_key)
+    # 取得排序後的冊別 (已預先排序)
+    all_books = list(table.books)
     
     # 冊別選擇區
     if len(all_books) > 1 or (len(all_books) == 1 and all_books[0] != '未分類'):
@@ -59,18 +52,18 @@ def render_main_menu(on_start_game):
     
     with col1:
         if st.button("📖 一般練習", use_container_width=True):
-            on_start_game('general', full_db)
+            on_start_game('general', table)
 
     with col2:
         if st.button("⚔️ 勇者闖關", use_container_width=True):
-            on_start_game('adventure', full_db)
+            on_start_game('adventure', table)
 
     with col3:
         if st.button("🔧 錯題複習", use_container_width=True):
-            on_start_game('review', full_db)
+            on_start_game('review', table)
 
     st.divider()
     col4, col5 = st.columns(2)
     with col4:
         if st.button("🧩 翻牌配對", use_container_width=True):
-            on_start_game('memory', full_db)
+            on_start_game('memory', table)
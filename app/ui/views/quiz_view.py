@@ -2,8 +2,8 @@
 # 一般練習與錯題複習介面
 
 import streamlit as st
-import random
-from app.core import config
+from collections import deque
+from app.core import config, logging_setup
 from app.services import audio_service, game_service
 from app.repositories import vocab_repository
 
@@ -53,7 +53,7 @@ def render_quiz_view():
 
     # 自動播放音訊 (Auto Play Audio)
     if st.session_state.char_to_speak and st.session_state.auto_play_audio:
-        audio_service.generate_audio_html(st.session_state.char_to_speak)
+        audio_service.generate_audio_html(st.session_state.char_to_speak, praise=st.session_state.praise_to_play)
         st.session_state.auto_play_audio = False
 
 def handle_answer(selected_option):
@@ -63,7 +63,8 @@ def handle_answer(selected_option):
     
     if selected_option['char'] == target['char']:
         st.session_state.score += 1
-        praise = random.choice(config.PRAISES)
+        praise = st.session_state.rng.choice(config.PRAISES)
+        st.session_state.praise_to_play = praise
         msg = f"✅ {praise['text']}{praise['emoji']}"
         
         # 冒險模式：扣減魔王體力
@@ -74,33 +75,101 @@ def handle_answer(selected_option):
                 st.session_state.monster_hp = 0
 
         if st.session_state.game_mode == 'review':
-            try:
-                vocab_repository.remove_mistake_from_file(target)
-                msg += " (已從錯題本移除)"
-            except Exception:
-                msg += " (⚠️ 紀錄更新失敗)"
+            # 說明：答對時延長複習間隔；間隔達到畢業門檻才從錯題本移除
+            # Description: A correct answer extends the interval; the word leaves the list once it graduates
+            scheduler = st.session_state.review_scheduler
+            card = scheduler.record(target['char'], correct=True, requeue=False)
+            if scheduler.is_graduated(target['char']):
+                try:
+                    vocab_repository.remove_mistake_from_file(target, st.session_state.learner_id)
+                    scheduler.forget(target['char'])
+                    msg += " (已從錯題本移除)"
+                except Exception:
+                    msg += " (⚠️ 紀錄更新失敗)"
+            else:
+                msg += f" (下次複習：{card.interval:g} 天後)"
             
             # 從當前題庫移除，避免重複抽到
-            st.session_state.db = [item for item in st.session_state.db if item['char'] != target['char']]
+            st.session_state.db = st.session_state.db.without(target['char'])
 
         st.session_state.feedback = {'type': 'success', 'msg': msg}
     else:
+        st.session_state.praise_to_play = None
         st.session_state.feedback = {
             'type': 'error', 
             'msg': f"❌ 哎呀，正確答案是： {target['char']} {target['zhuyin']}"
         }
-        vocab_repository.log_mistake(target)
+        vocab_repository.log_mistake(target, st.session_state.learner_id)
+        if st.session_state.game_mode == 'review':
+            st.session_state.review_scheduler.record(target['char'], correct=False)
+        else:
+            # 說明：其他模式答錯也重置該字的複習間隔 (不排入佇列)
+            # Description: A miss in other modes also resets the word's review interval (without queueing it)
+            if st.session_state.review_scheduler is not None:
+                st.session_state.review_scheduler.record(target['char'], correct=False, requeue=False)
+            if st.session_state.mistake_sampler is not None:
+                st.session_state.mistake_sampler.record_miss(target)
         # 冒險模式：扣減玩家體力
         # Adventure Mode: Decrease player HP
         if st.session_state.game_mode == 'adventure':
             st.session_state.player_hp -= 1
 
+    if st.session_state.review_scheduler is not None and st.session_state.total_answered % config.SRS_SAVE_EVERY == 0:
+        save_review_progress()
+
     st.session_state.char_to_speak = target['char']
     st.session_state.auto_play_audio = True
 
+def save_review_progress():
+    """
+    儲存錯題複習的排程狀態 (有變更時才寫入)。
+    Save the review scheduler state if it changed.
+    """
+    scheduler = st.session_state.get('review_scheduler')
+    if scheduler is not None and scheduler.dirty:
+        vocab_repository.save_review_state(scheduler.to_dict(), st.session_state.learner_id)
+        scheduler.dirty = False
+
+def fill_question_queue():
+    """
+    預先產生接下來的題目並在背景下載語音 (錯題複習依作答結果排程，不預先產生)。
+    Pre-generate upcoming questions and warm their audio in the background.
+    Review mode is skipped since its order depends on each answer.
+    """
+    if st.session_state.game_mode == 'review':
+        return
+    queue = st.session_state.question_queue
+    while len(queue) < config.QUESTION_PREFETCH:
+        target, options, mode = game_service.get_question(
+            st.session_state.db, st.session_state.full_db,
+            rng=st.session_state.rng, sampler=st.session_state.mistake_sampler,
+            bag=st.session_state.question_bag
+        )
+        if target is None:
+            break
+        queue.append({'target': target, 'options': options, 'mode': mode})
+        audio_service.prefetch_audio(target['char'])
+
+def reset_question_queue():
+    """開始新遊戲時清空預先產生的題目"""
+    st.session_state.question_queue = deque()
+
 def prepare_next_question():
-    """準備下一題數據"""
-    target, options, mode = game_service.get_question(st.session_state.db, st.session_state.full_db)
-    st.session_state.current_question = {'target': target, 'options': options, 'mode': mode}
+    """準備下一題數據 (優先從預先產生的佇列取出)"""
+    queue = st.session_state.question_queue
+    if queue:
+        st.session_state.current_question = queue.popleft()
+    else:
+        scheduler = st.session_state.review_scheduler if st.session_state.game_mode == 'review' else None
+        with logging_setup.log_latency("get_question"):
+            target, options, mode = game_service.get_question(
+                st.session_state.db, st.session_state.full_db, scheduler,
+                st.session_state.rng, st.session_state.mistake_sampler,
+                st.session_state.question_bag
+            )
+        st.session_state.current_question = {'target': target, 'options': options, 'mode': mode}
+        if target is not None:
+            audio_service.prefetch_audio(target['char'])
     st.session_state.feedback = None
     st.session_state.char_to_speak = None
+    fill_question_queue()
@@ -0,0 +1,56 @@
+# Benchmark: deterministic question generation with a fixed seed
+# 效能測試：以固定亂數種子產生題目，結果可跨版本比較
+#
+# 使用方式 (Usage):
+#   python bench_questions.py                       # 全部冊別，seed=0，10000 題
+#   python bench_questions.py --seed 42 -n 50000
+#   python bench_questions.py --books 第一冊 第二冊
+#
+# 同一個 seed 與題庫會得到相同的 digest；digest 改變代表出題結果改變 (不只是速度)。
+
+import sys
+import time
+import random
+import hashlib
+import argparse
+
+from app.core import config
+from app.repositories import vocab_store
+from app.services import game_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seeded question generation")
+    parser.add_argument('--seed', type=int, default=0, help="RNG seed (default: 0)")
+    parser.add_argument('-n', '--questions', type=int, default=10000, help="Number of questions (default: 10000)")
+    parser.add_argument('--books', nargs='*', help="Books to include (default: all)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = vocab_store.get_vocabulary(config.VOCAB_FILE)
+    load_ms = (time.perf_counter() - start) * 1000
+    if not len(table):
+        print(f"Error: no vocabulary found in {config.VOCAB_FILE}")
+        sys.exit(1)
+
+    db = table.items_for_books(args.books or table.books)
+    if len(db) < config.MIN_WORDS_FOR_QUIZ:
+        print(f"Error: only {len(db)} words in the selected books")
+        sys.exit(1)
+
+
+    rng = random.Random(args.seed)
+    bag = game_service.ShuffleBag()
+    digest = hashlib.sha256()
+    start = time.perf_counter()
+    for _ in range(args.questions):
+        target, options, mode = game_service.get_question(db, table, rng=rng, bag=bag)
+        digest.update(f"{mode}|{target['char']}|{''.join(o['char'] for o in options)}\n".encode('utf-8'))
+    elapsed = time.perf_counter() - start
+
+    print(f"Words: {len(db)} / {len(table)}, seed: {args.seed}, questions: {args.questions}")
+    print(f"Vocabulary load (including the phonetic index): {load_ms:.1f} ms")
+    print(f"Question generation: {elapsed * 1000:.1f} ms total, {elapsed / args.questions * 1e6:.1f} µs/question")
+    print(f"Digest: {digest.hexdigest()[:16]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Build step: compile vocabulary.csv into a binary snapshot for fast cold start
+# 建置步驟：把 vocabulary.csv 編譯成二進位快照，加快程式啟動
+#
+# 使用方式 (Usage):
+#   python build_vocab_snapshot.py
+#
+# 之後修改 CSV 時，程式會偵測到快照過期並自動改讀 CSV、重建快照。
+
+import os
+import sys
+import time
+
+from app.core import config
+from app.repositories import vocab_repository, vocab_snapshot
+
+def main():
+    if not os.path.exists(config.VOCAB_FILE):
+        print(f"Error: {config.VOCAB_FILE} not found!")
+        sys.exit(1)
+
+    path = vocab_repository.build_vocabulary_snapshot(config.VOCAB_FILE)
+    if path is None:
+        print(f"Error: no vocabulary rows found in {config.VOCAB_FILE}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    snapshot = vocab_snapshot.load_snapshot(config.VOCAB_FILE, path)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Snapshot written: {path} ({os.path.getsize(path)} bytes)")
+    print(f"Words: {len(snapshot.chars)}, books: {len(snapshot.books)}, load time: {elapsed_ms:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,194 @@
-import csv
+# Batch generator for pre-recorded vocabulary and praise audio
+# 批次產生生字與稱讚語音 (可同時執行多個工作、失敗重試、顯示進度)
+#
+# 使用方式 (Usage):
+#   python generate_audio_assets.py                  # edge-tts，8 個工作同時進行
+#   python generate_audio_assets.py --workers 16 --retries 5
+#   python generate_audio_assets.py --backend stub   # 不連網，寫入假語音到暫存資料夾 (測試用)
+#   python generate_audio_assets.py --backend stub --output-dir /tmp/audio-test
+#
+# 已存在的檔案會略過；檔案先寫到暫存檔再改名，中斷後不會留下不完整的 mp3。
+
 import os
+import csv
+import sys
+import time
+import random
+import tempfile
 import asyncio
-import edge_tts
-
-# Configuration
-VOCAB_FILE = 'vocabulary.csv'
-AUDIO_DIR = 'audio'
-VOCAB_AUDIO_DIR = os.path.join(AUDIO_DIR, 'vocab')
-PRAISE_AUDIO_DIR = os.path.join(AUDIO_DIR, 'praises')
-
-# Praises list (must match the app)
-praises = [
-    {"text": "太棒了！", "filename": "praise_01"},
-    {"text": "完全正確！", "filename": "praise_02"},
-    {"text": "你真厲害！", "filename": "praise_03"},
-    {"text": "水啦！答對了！", "filename": "praise_04"},
-    {"text": "Excellent!", "filename": "praise_05"},
-    {"text": "你是漢字小天才！", "filename": "praise_06"},
-    {"text": "好聰明喔！", "filename": "praise_07"},
-    {"text": "答得好！繼續保持！", "filename": "praise_08"},
-    {"text": "沒錯！就是這個！", "filename": "praise_09"},
-    {"text": "你的中文越來越好了！", "filename": "praise_10"},
-    {"text": "太神了！", "filename": "praise_11"},
-    {"text": "給你一個大拇指！", "filename": "praise_12"}
-]
-
-async def generate_audio(text, filepath, voice="zh-TW-HsiaoChenNeural", rate="+20%"):
-    if os.path.exists(filepath):
-        print(f"Skipping existing: {filepath}")
-        return
+import argparse
 
-    print(f"Generating: {text} -> {filepath}")
-    try:
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
+from app.core import config
+
+# Configuration (shared with the app, so the files land where audio_service looks)
+VOCAB_FILE = config.VOCAB_FILE
+AUDIO_DIR = config.AUDIO_DIR
+
+DEFAULT_VOICE = "zh-TW-HsiaoChenNeural"
+DEFAULT_RATE = "+20%"
+
+# ==========================================
+# Backends (語音產生後端)
+# ==========================================
+class EdgeTTSBackend:
+    """使用 edge-tts 產生語音 (需要網路與 edge_tts 套件)"""
+
+    def __init__(self, voice: str, rate: str):
+        import edge_tts  # 說明：只有實際使用時才需要安裝 (Only required when this backend is used)
+        self._edge_tts = edge_tts
+        self.voice = voice
+        self.rate = rate
+
+    async def synthesize(self, text: str, filepath: str) -> None:
+        communicate = self._edge_tts.Communicate(text, self.voice, rate=self.rate)
         await communicate.save(filepath)
-    except Exception as e:
-        print(f"Error generating {text}: {e}")
 
-async def main():
-    # Create directories
-    os.makedirs(VOCAB_AUDIO_DIR, exist_ok=True)
-    os.makedirs(PRAISE_AUDIO_DIR, exist_ok=True)
+class StubBackend:
+    """
+    不連網的假後端：寫入固定內容 (不是真正的 mp3)，用於測試流程與量測排程開銷。
+    只能寫到 --output-dir 或暫存資料夾，不會寫進 app 使用的 audio/。
+    """
+
+    def __init__(self, voice: str, rate: str, delay: float = 0.01):
+        self.voice = voice
+        self.delay = delay
 
-    # 1. Generate Praise Audio
-    print("--- Generating Praise Audio ---")
-    for p in praises:
-        filepath = os.path.join(PRAISE_AUDIO_DIR, f"{p['filename']}.mp3")
-        await generate_audio(p['text'], filepath)
+    async def synthesize(self, text: str, filepath: str) -> None:
+        await asyncio.sleep(self.delay)
+        with open(filepath, 'wb') as f:
+            f.write(b'ID3' + f"{self.voice}:{text}".encode('utf-8'))
+
+BACKENDS = {'edge': EdgeTTSBackend, 'stub': StubBackend}
+
+# ==========================================
+# Jobs (工作清單)
+# ==========================================
+def collect_jobs(vocab_dir: str, praise_dir: str):
+    """
+    列出所有要產生的 (文字, 輸出路徑)：先稱讚語，再依 CSV 順序列出生字 (同一個字只列一次)。
+    List (text, path) pairs: praises first, then each distinct vocabulary char in CSV order.
+    """
+    jobs = [(p['text'], os.path.join(praise_dir, f"{p['filename']}.mp3")) for p in config.PRAISES]
 
-    # 2. Generate Vocabulary Audio
-    print("\n--- Generating Vocabulary Audio ---")
     if not os.path.exists(VOCAB_FILE):
         print(f"Error: {VOCAB_FILE} not found!")
+        return jobs
+
+    seen = set()
+    with open(VOCAB_FILE, mode='r', encoding=config.ENCODING_TYPE) as csvfile:
+        for row in csv.DictReader(csvfile):
+            char = (row.get('char') or '').strip()
+            if char and char not in seen:
+                seen.add(char)
+                # 只唸字本身 (Just the character; the app plays it after the answer)
+                jobs.append((char, os.path.join(vocab_dir, f"{char}.mp3")))
+    return jobs
+
+class Progress:
+    """進度與產生速度回報 (Progress and throughput report)"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.generated = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        if ok:
+            self.generated += 1
+        else:
+            self.failed += 1
+        if self.done % 25 == 0 or self.done == self.total:
+            elapsed = time.perf_counter() - self.start
+            rate = self.done / elapsed if elapsed else 0.0
+            print(f"[{self.done}/{self.total}] {rate:.1f} files/s, {self.failed} failed")
+
+async def generate_one(backend, text: str, filepath: str, retries: int, backoff: float) -> bool:
+    """
+    產生一個語音檔：寫入暫存檔後改名；失敗時以指數退避 (加隨機抖動) 重試。
+    Generate one file via a temp file + rename, retrying with jittered exponential backoff.
+    """
+    temp_path = f"{filepath}.tmp"
+    for attempt in range(retries + 1):
+        try:
+            await backend.synthesize(text, temp_path)
+            os.replace(temp_path, filepath)
+            return True
+        except Exception as e:
+            if attempt == retries:
+                print(f"Error generating {text}: {e}")
+                break
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            print(f"Retrying {text} in {delay:.1f}s ({attempt + 1}/{retries}): {e}")
+            await asyncio.sleep(delay)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False
+
+async def run(backend, jobs, workers: int, retries: int, backoff: float) -> Progress:
+    """以 semaphore 限制同時進行的工作數 (Bound concurrency with a semaphore)"""
+    semaphore = asyncio.Semaphore(workers)
+    progress = Progress(len(jobs))
+
+    async def worker(text: str, filepath: str) -> None:
+        async with semaphore:
+            ok = await generate_one(backend, text, filepath, retries, backoff)
+        progress.update(ok)
+
+    await asyncio.gather(*(worker(text, filepath) for text, filepath in jobs))
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate vocabulary and praise audio assets")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument('--retries', type=int, default=3, help="Retries per file (default: 3)")
+    parser.add_argument('--backoff', type=float, default=1.0, help="Initial retry delay in seconds (default: 1.0)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='edge', help="TTS backend (default: edge)")
+    parser.add_argument('--voice', default=DEFAULT_VOICE, help="Voice (default: %(default)s)")
+    parser.add_argument('--rate', default=DEFAULT_RATE, help="Speaking rate (default: %(default)s)")
+    parser.add_argument('--output-dir', help=f"Output directory (default: {AUDIO_DIR}; a temp dir for --backend stub)")
+    args = parser.parse_args()
+
+    # 說明：假語音不可寫進 app 使用的資料夾，否則會被播放，之後真正產生時也會因為檔案已存在而略過
+    # Description: Fake clips must never land in the app's audio dir: they would be played,
+    # and a later real run would skip them because the files already exist
+    output_dir = args.output_dir
+    if args.backend == 'stub':
+        if output_dir is None:
+            output_dir = tempfile.mkdtemp(prefix='audio-stub-')
+        elif os.path.abspath(output_dir) == os.path.abspath(AUDIO_DIR):
+            print(f"Error: --backend stub cannot write to {AUDIO_DIR}; choose another --output-dir")
+            sys.exit(1)
+    elif output_dir is None:
+        output_dir = AUDIO_DIR
+    vocab_dir = os.path.join(output_dir, os.path.relpath(config.VOCAB_AUDIO_DIR, AUDIO_DIR))
+    praise_dir = os.path.join(output_dir, os.path.relpath(config.PRAISE_AUDIO_DIR, AUDIO_DIR))
+
+    # Create directories
+    os.makedirs(vocab_dir, exist_ok=True)
+    os.makedirs(praise_dir, exist_ok=True)
+
+    jobs = collect_jobs(vocab_dir, praise_dir)
+    pending = [(text, filepath) for text, filepath in jobs if not os.path.exists(filepath)]
+    print(f"{len(jobs)} files in {output_dir}, {len(jobs) - len(pending)} already exist, {len(pending)} to generate "
+          f"({args.backend}, {args.workers} workers)")
+    if not pending:
         return
 
-    with open(VOCAB_FILE, mode='r', encoding='utf-8-sig') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            char = row.get('char', '').strip()
-            if char:
-                # Use character as filename (handle special chars if needed, but Chinese chars are usually fine in modern FS)
-                # For safety, maybe hash it or just use it if FS supports. 
-                # Let's use the char directly for readability, assuming standard OS support.
-                filepath = os.path.join(VOCAB_AUDIO_DIR, f"{char}.mp3")
-                
-                # Generate audio for the character (or char + zhuyin if preferred? Usually just char is enough for "Correct answer is X")
-                # The app says: "哎呀答錯了，正確答案是 {target['char']}" -> We probably want to record "正確答案是 X" or just "X"?
-                # The current app logic plays: f"哎呀答錯了，正確答案是 {target['char']}"
-                # This is dynamic. To pre-generate, we can't pre-generate every combination.
-                # Strategy: 
-                # Option A: Just play the character sound "X". The user hears "X".
-                # Option B: Generate "Correct answer is" separately and play two audios? Streamlit doesn't support queuing easily.
-                # Decision: Just play the character pronunciation. It's faster and cleaner.
-                
-                await generate_audio(char, filepath)
-
-    print("\nAll audio generation complete!")
+    try:
+        backend = BACKENDS[args.backend](args.voice, args.rate)
+    except ImportError as e:
+        print(f"Error: {e}. Install it with 'pip install edge-tts' or use --backend stub")
+        sys.exit(1)
+    progress = asyncio.run(run(backend, pending, max(1, args.workers), args.retries, args.backoff))
+
+    elapsed = time.perf_counter() - progress.start
+    print(f"\nGenerated {progress.generated}, failed {progress.failed} in {elapsed:.1f}s "
+          f"({progress.done / elapsed if elapsed else 0:.1f} files/s)")
+    if progress.failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -3,10 +3,14 @@
 
 import streamlit as st
 import random
-from app.core import config
+import logging
+from collections import deque
+from app.core import config, logging_setup
 from app.ui import styles
 from app.ui.views import main_menu, quiz_view, adventure_view, memory_view
 from app.services import game_service
+from app.services.review_scheduler import ReviewScheduler
+from app.services.weighted_sampler import MistakeWeightedSampler
 from app.repositories import vocab_repository
 
 def init_session_state():
@@ -24,7 +28,15 @@ def init_session_state():
         'full_db': [],
         'char_to_speak': None,
         'auto_play_audio': False,
+        'praise_to_play': None,  # 答對時先播放的稱讚語音 (config.PRAISES 其中一筆)
         'selected_books': [],
+        'learner_id': '',  # 學生代號 (空白時使用共用錯題本)
+        'review_scheduler': None,  # 錯題複習的間隔複習排程 (ReviewScheduler)
+        'mistake_sampler': None,  # 一般/冒險模式的錯題加權抽樣器 (MistakeWeightedSampler)
+        'question_bag': None,  # 不重複出題順序 (ShuffleBag)
+        'question_queue': deque(),  # 預先產生的題目 (Prefetched questions)
+        'rng_seed': None,  # 本局的亂數種子 (記錄下來即可重播同一局)
+        'rng': random.Random(),  # 本局的亂數產生器 (Per-session RNG)
         
         # Adventure
         'monster_hp': config.INITIAL_MONSTER_HP,
@@ -32,37 +44,50 @@ def init_session_state():
         'current_monster': None,
         
         # Memory
-        'memory_cards': [],
-        'flipped_indices': [],
-        'memory_solved': False,
+        'memory_board': None,  # 記憶遊戲盤面 (MemoryBoard)
     }
     
     for key, val in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = val
 
-def start_game(mode_name, full_db):
+def start_game(mode_name, table):
     """
     點擊模式按鈕後的啟動邏輯。
     Game startup logic after clicking a mode button.
+
+    Args:
+        mode_name: 'general', 'review', 'adventure' or 'memory'
+        table: Shared VocabularyTable from vocab_store
     """
     if not st.session_state.selected_books:
         st.warning("⚠️ 請至少選擇一冊！")
         return
 
-    # 過濾題庫 (Filter DB by selected books)
-    filtered_db = [item for item in full_db if item['book'] in st.session_state.selected_books]
+    # 過濾題庫 (Filter DB by selected books, using the prebuilt book index)
+    # 說明：session 只保存索引陣列 (VocabSlice)，生字物件由所有 session 共用
+    # Description: Sessions keep only an index array (VocabSlice); entries are shared
+    filtered_db = table.items_for_books(st.session_state.selected_books)
     
     # 錯題複習特殊處理 (Special handling for Review mode)
+    # 說明：只複習已到期的錯題 (不足最少題數時補上最快到期的字)，出題順序由排程 heap 決定
+    # Description: Review only due mistakes (topped up to the minimum); the scheduler heap sets the order
+    # 說明：一般/冒險模式也載入排程，答錯時重置該字的複習間隔
+    # Description: General/adventure modes load the scheduler too, so a miss resets the word's interval
+    scheduler = None
+    if mode_name != 'memory':
+        scheduler = ReviewScheduler.from_dict(vocab_repository.load_review_state(st.session_state.learner_id))
     if mode_name == 'review':
-        mistakes_cache = vocab_repository.load_vocabulary(config.ERROR_LOG_FILE)
-        char_to_book = {item['char']: item['book'] for item in full_db}
-        filtered_db = []
-        for item in mistakes_cache:
-            book = char_to_book.get(item['char'], '未分類')
-            if book in st.session_state.selected_books:
-                item['book'] = book
-                filtered_db.append(item)
+        learner_id = st.session_state.learner_id
+        mistakes_cache = vocab_repository.load_mistakes(learner_id)
+        scheduler.retain(item['char'] for item in mistakes_cache)
+        candidates = table.slice_for_chars(
+            (item['char'] for item in mistakes_cache),
+            books=st.session_state.selected_books
+        )
+        session_chars = scheduler.select_session((entry['char'] for entry in candidates), config.MIN_WORDS_FOR_QUIZ)
+        scheduler.build_queue(session_chars)
+        filtered_db = table.slice_for_chars(session_chars)
 
     if len(filtered_db) < config.MIN_WORDS_FOR_QUIZ and mode_name != 'memory':
         st.warning(f"⚠️ 生字數量不足 ({len(filtered_db)})，請重新選擇範圍")
@@ -70,6 +95,21 @@ def start_game(mode_name, full_db):
 
     st.session_state.db = filtered_db
     st.session_state.game_mode = mode_name
+    st.session_state.review_scheduler = scheduler
+    st.session_state.question_bag = game_service.ShuffleBag()
+    st.session_state.rng_seed, replay = choose_seed()
+    st.session_state.rng = random.Random(st.session_state.rng_seed)
+    # 說明：一般/冒險模式依答錯次數與時間加權抽題；權重取決於錯題本與目前時間，
+    #       所以以 ?seed= 重播時停用，題目順序只由種子決定
+    # Description: Weight targets by past mistakes in general/adventure. The weights depend on the
+    #              mistake log and the clock, so a ?seed= replay turns them off and the seed alone decides
+    st.session_state.mistake_sampler = None
+    if mode_name in ('general', 'adventure') and not replay:
+        st.session_state.mistake_sampler = MistakeWeightedSampler(
+            filtered_db, table, vocab_repository.load_mistakes(st.session_state.learner_id)
+        )
+    logging_setup.set_log_context(session_id=get_session_id(), mode=mode_name)
+    logging.info(f"Game started: {len(filtered_db)} words from {len(st.session_state.selected_books)} books, seed={st.session_state.rng_seed}")
     
     # 重置遊戲狀態 (Reset states)
     st.session_state.score = 0
@@ -77,24 +117,52 @@ def start_game(mode_name, full_db):
     st.session_state.feedback = None
     st.session_state.monster_hp = config.INITIAL_MONSTER_HP
     st.session_state.player_hp = config.INITIAL_PLAYER_HP
-    st.session_state.current_monster = random.choice(config.MONSTERS)
+    st.session_state.current_monster = st.session_state.rng.choice(config.MONSTERS)
 
     if mode_name == 'memory':
-        st.session_state.memory_cards = game_service.init_memory_game_cards(filtered_db)
-        st.session_state.flipped_indices = []
-        st.session_state.memory_solved = False
+        st.session_state.memory_board = game_service.init_memory_game_cards(filtered_db, st.session_state.rng)
     else:
-        # 產生第一題 (Generate first question)
-        target, options, mode = game_service.get_question(filtered_db, full_db)
-        st.session_state.current_question = {'target': target, 'options': options, 'mode': mode}
+        # 產生第一題，並預先產生接下來的題目 (Generate the first question and prefetch the next ones)
+        quiz_view.reset_question_queue()
+        quiz_view.prepare_next_question()
     
     st.rerun()
 
+def choose_seed():
+    """
+    決定本局的亂數種子：網址帶有 ?seed=123 時使用該值 (重播)，否則隨機產生。
+    可重播的模式：一般、冒險 (重播時不做錯題加權) 與記憶遊戲；錯題複習依到期時間出題，無法重播。
+    Pick this game's RNG seed: the ?seed= query parameter when given (replay), otherwise a fresh one.
+    General and adventure (without mistake weighting during a replay) and memory games are
+    replayable; review mode follows due dates and is not.
+
+    Returns:
+        (seed, whether it came from ?seed=)
+    """
+    seed = st.query_params.get('seed')
+    if seed is not None:
+        try:
+            return int(seed), True
+        except ValueError:
+            logging.warning(f"Ignoring invalid seed parameter: {seed}")
+    return random.SystemRandom().randrange(2 ** 32), False
+
+def get_session_id():
+    """取得目前 Streamlit session 的 id (取不到時回傳 None)"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
 def main():
     """主程式循環"""
+    logging_setup.setup_logging()
     st.set_page_config(page_title="美洲華語生字小幫手", page_icon="📝", layout="wide")
     styles.load_custom_css()
     init_session_state()
+    logging_setup.set_log_context(session_id=get_session_id(), mode=st.session_state.game_mode)
 
     # 側邊欄 (Sidebar)
     with st.sidebar:
@@ -103,11 +171,19 @@ def main():
             st.session_state.game_mode = None
             st.rerun()
         st.divider()
+        if st.session_state.game_mode is not None and st.session_state.rng_seed is not None:
+            # 說明：有錯題加權的局以 ?seed= 重播時不加權，題目順序會不同
+            # Description: A weighted game replays unweighted under ?seed=, so its questions differ
+            weighted = "，錯題加權 (重播時不加權)" if st.session_state.mistake_sampler is not None else ""
+            st.caption(f"🎲 seed={st.session_state.rng_seed}{weighted}")
         st.caption("Designed for Tablet Interface")
 
     # 視圖切換 (View Routing)
     mode = st.session_state.game_mode
     if mode is None:
+        # 回到主選單時寫入緩衝中的錯題與複習進度 (Flush buffered mistakes and review progress on returning to the menu)
+        vocab_repository.flush_mistakes()
+        quiz_view.save_review_progress()
         main_menu.render_main_menu(on_start_game=start_game)
     elif mode in ['general', 'review']:
         quiz_view.render_quiz_view()
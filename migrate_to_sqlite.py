@@ -0,0 +1,27 @@
+# One-shot importer: copy vocabulary.csv, every mistake list (CSV + journal) and review state into SQLite
+# 一次性匯入工具：將現有 CSV、錯題日誌與間隔複習狀態匯入 SQLite 資料庫
+#
+# 使用方式 (Usage):
+#   python migrate_to_sqlite.py
+#   QUIZ_STORAGE_BACKEND=sqlite streamlit run main.py
+
+import os
+import sys
+
+from app.core import config
+from app.repositories import sqlite_backend, vocab_repository
+
+def main():
+    if not os.path.exists(config.VOCAB_FILE):
+        print(f"Error: {config.VOCAB_FILE} not found!")
+        sys.exit(1)
+
+    vocab_repository.import_csv_into_sqlite(config.VOCAB_FILE)
+    with sqlite_backend.connection() as conn:
+        vocab_count = conn.execute("SELECT COUNT(*) FROM vocabulary").fetchone()[0]
+        mistake_count = conn.execute("SELECT COUNT(*) FROM mistakes").fetchone()[0]
+        card_count = conn.execute("SELECT COUNT(*) FROM review_state").fetchone()[0]
+    print(f"Imported into {config.SQLITE_DB_FILE}: {vocab_count} words, {mistake_count} mistakes, {card_count} review cards")
+
+if __name__ == "__main__":
+    main()
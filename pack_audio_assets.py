@@ -0,0 +1,54 @@
+# Pack pre-generated vocabulary audio into one archive
+# 把 audio/vocab/*.mp3 打包成單一語音封裝檔 (audio/vocab.pack + 索引)，部署時只需傳一個大檔案
+#
+# 使用方式 (Usage):
+#   python generate_audio_assets.py      # 先產生個別語音檔
+#   python process_audio_assets.py       # (可選) 壓縮；有壓縮版時預設打包壓縮版 (來源改變時自動重新打包)
+#   python pack_audio_assets.py          # 附加新的字與內容有變 (重新產生) 的字
+#   python pack_audio_assets.py --rebuild    # 重新打包全部 (清除舊版本留下的無用空間)
+#
+# 程式執行中也可以附加新字：索引更新後 audio_service 會自動重新載入封裝檔。
+
+import os
+import sys
+import time
+import argparse
+
+from app.core import config
+from app.services import audio_pack
+
+def iter_clips(directory: str):
+    """依檔名順序讀取 <字>.mp3 (已打包的字由 append_clips 比對內容決定是否略過)"""
+    for filename in sorted(os.listdir(directory)):
+        text, ext = os.path.splitext(filename)
+        if ext != '.mp3':
+            continue
+        with open(os.path.join(directory, filename), 'rb') as f:
+            yield text, f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack vocabulary audio into a single archive")
+    parser.add_argument('--rebuild', action='store_true', help="Repack every clip instead of appending new ones")
+    default_source = config.COMPACT_VOCAB_AUDIO_DIR if os.path.isdir(config.COMPACT_VOCAB_AUDIO_DIR) else config.VOCAB_AUDIO_DIR
+    parser.add_argument('--source', default=default_source, help="Directory of <char>.mp3 files (default: %(default)s)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        print(f"Error: {args.source} not found! Run generate_audio_assets.py first.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    written = audio_pack.append_clips(config.AUDIO_PACK_FILE, config.AUDIO_PACK_INDEX,
+                                      iter_clips(args.source), rebuild=args.rebuild,
+                                      source=os.path.normpath(args.source))
+    elapsed = time.perf_counter() - start
+
+    index = audio_pack.read_index(config.AUDIO_PACK_INDEX)
+    live = sum(length for _, length in index.clips.values())
+    size = os.path.getsize(config.AUDIO_PACK_FILE) if os.path.exists(config.AUDIO_PACK_FILE) else 0
+    print(f"Packed {written} new or changed clips from {args.source} in {elapsed:.2f}s")
+    print(f"{config.AUDIO_PACK_FILE}: {len(index.clips)} clips, {size / 1024:.0f} KB "
+          f"({(size - live) / 1024:.0f} KB of replaced clips; --rebuild reclaims it)")
+
+if __name__ == "__main__":
+    main()
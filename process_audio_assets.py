@@ -0,0 +1,160 @@
+# Post-process pre-generated audio: trim silence, normalize loudness, compress
+# 語音後製：去除前後靜音、音量標準化、轉成低位元率單聲道 MP3 (需要 ffmpeg / ffprobe)
+#
+# 使用方式 (Usage):
+#   python generate_audio_assets.py          # 先產生原始語音
+#   python process_audio_assets.py           # 輸出到 audio/compact/，每個 CPU 核心一個 ffmpeg
+#   python process_audio_assets.py --bitrate 24k --workers 4
+#   python process_audio_assets.py --force   # 全部重新處理
+#
+# 原始檔不變；壓縮版比原始檔新時略過。audio_service 與 pack_audio_assets.py 會優先使用壓縮版。
+# 已有語音封裝檔時，完成後自動把壓縮版打包進去 (封裝檔優先於個別檔案，否則學生仍會收到原始語音)。
+# 說明：使用 MP3 而不是 Opus，因為舊版 iPad Safari 不支援 Opus，且播放端固定使用 audio/mp3。
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from app.core import config
+from app.services import audio_pack
+from pack_audio_assets import iter_clips
+
+# 去除前後靜音 (反轉後再套用一次處理尾端)，再以 EBU R128 標準化音量
+TRIM_SILENCE = "silenceremove=start_periods=1:start_threshold=-50dB:start_silence=0.05"
+AUDIO_FILTER = f"{TRIM_SILENCE},areverse,{TRIM_SILENCE},areverse,loudnorm=I=-16:TP=-1.5:LRA=11"
+
+SOURCES = [
+    (config.VOCAB_AUDIO_DIR, config.COMPACT_VOCAB_AUDIO_DIR),
+    (config.PRAISE_AUDIO_DIR, config.COMPACT_PRAISE_AUDIO_DIR),
+]
+
+class Result(NamedTuple):
+    name: str
+    ok: bool
+    in_bytes: int = 0
+    out_bytes: int = 0
+    in_seconds: float = 0.0
+    out_seconds: float = 0.0
+
+def probe_duration(path: str) -> float:
+    """以 ffprobe 取得長度 (秒)；失敗時回傳 0"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        capture_output=True, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return 0.0
+
+def collect_jobs(force: bool):
+    """列出需要處理的 (原始檔, 輸出檔)；輸出比原始檔新時略過 (除非 force)"""
+    jobs = []
+    for source_dir, output_dir in SOURCES:
+        if not os.path.isdir(source_dir):
+            continue
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.endswith('.mp3'):
+                continue
+            source = os.path.join(source_dir, filename)
+            output = os.path.join(output_dir, filename)
+            if not force and os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source):
+                continue
+            jobs.append((source, output))
+    return jobs
+
+def process_one(source: str, output: str, bitrate: str, sample_rate: int) -> Result:
+    """
+    處理一個語音檔：寫到暫存檔後改名，失敗時不留下不完整的輸出。
+    Process one clip via a temp file + rename; a failure leaves no partial output.
+    """
+    name = os.path.basename(source)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    temp_path = f"{output}.{os.getpid()}.tmp.mp3"
+    command = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-y', '-i', source,
+        '-af', AUDIO_FILTER,
+        '-ac', '1', '-ar', str(sample_rate), '-codec:a', 'libmp3lame', '-b:a', bitrate,
+        '-map_metadata', '-1', temp_path,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(temp_path):
+        print(f"Error processing {name}: {result.stderr.strip()}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return Result(name, False)
+
+    os.replace(temp_path, output)
+    return Result(name, True, os.path.getsize(source), os.path.getsize(output),
+                  probe_duration(source), probe_duration(output))
+
+def print_report(results: List[Result], elapsed: float) -> None:
+    """大小與長度報告 (Size and duration report)"""
+    done = [r for r in results if r.ok]
+    failed = len(results) - len(done)
+    print(f"\nProcessed {len(done)} files, {failed} failed in {elapsed:.1f}s")
+    if not done:
+        return
+
+    in_bytes = sum(r.in_bytes for r in done)
+    out_bytes = sum(r.out_bytes for r in done)
+    in_seconds = sum(r.in_seconds for r in done)
+    out_seconds = sum(r.out_seconds for r in done)
+    ratio = f"{out_bytes / in_bytes:.0%}" if in_bytes else "n/a"
+    print(f"Size:     {in_bytes / 1024:.0f} KB -> {out_bytes / 1024:.0f} KB "
+          f"({ratio}), {out_bytes / len(done) / 1024:.1f} KB per clip")
+    print(f"Duration: {in_seconds:.1f}s -> {out_seconds:.1f}s "
+          f"({in_seconds - out_seconds:.1f}s of silence trimmed), {out_seconds / len(done):.2f}s per clip")
+
+    print("Largest compact clips:")
+    for r in sorted(done, key=lambda r: r.out_bytes, reverse=True)[:5]:
+        print(f"  {r.name}: {r.out_bytes / 1024:.1f} KB, {r.out_seconds:.2f}s")
+
+def repack_compact_clips() -> None:
+    """
+    把壓縮版打包進既有的語音封裝檔 (封裝檔優先於個別檔案，不重新打包的話學生仍會收到原始語音)。
+    Pack the compact clips into the existing audio pack; the pack wins over loose
+    files, so without this learners would keep getting the full-rate originals.
+    """
+    directory = config.COMPACT_VOCAB_AUDIO_DIR
+    if not os.path.isdir(directory):
+        return
+    written = audio_pack.append_clips(config.AUDIO_PACK_FILE, config.AUDIO_PACK_INDEX, iter_clips(directory),
+                                      source=os.path.normpath(directory))
+    print(f"Repacked {written} compact clips into {config.AUDIO_PACK_FILE}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Trim, normalize and compress pre-generated audio")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel ffmpeg processes (default: %(default)s)")
+    parser.add_argument('--bitrate', default='32k', help="MP3 bitrate (default: %(default)s)")
+    parser.add_argument('--sample-rate', type=int, default=22050, help="Output sample rate (default: %(default)s)")
+    parser.add_argument('--force', action='store_true', help="Reprocess files that are already up to date")
+    args = parser.parse_args()
+
+    missing: Optional[str] = next((tool for tool in ('ffmpeg', 'ffprobe') if shutil.which(tool) is None), None)
+    if missing:
+        print(f"Error: {missing} not found. Install ffmpeg (e.g. 'apt install ffmpeg' or 'brew install ffmpeg').")
+        sys.exit(1)
+
+    jobs = collect_jobs(args.force)
+    print(f"{len(jobs)} files to process ({max(1, args.workers)} workers)")
+    if not jobs:
+        return
+
+    # 說明：每個工作都是獨立的 ffmpeg 行程，執行緒只負責等待，所以能用滿所有 CPU 核心
+    # Description: Each job is its own ffmpeg process; threads only wait on them, so all cores are used
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(lambda job: process_one(job[0], job[1], args.bitrate, args.sample_rate), jobs))
+    print_report(results, time.perf_counter() - start)
+    if os.path.exists(config.AUDIO_PACK_INDEX):
+        repack_compact_clips()
+    if any(not r.ok for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Local stub TTS server for testing the live TTS fallback
+# 本機假語音伺服器：測試連線池、逾時與斷路器時使用，不需要連網
+#
+# 使用方式 (Usage):
+#   python stub_tts_server.py                         # http://127.0.0.1:8765/translate_tts
+#   python stub_tts_server.py --delay 6               # 每個請求延遲 6 秒 (模擬逾時)
+#   python stub_tts_server.py --fail-rate 0.5         # 一半的請求回傳 503
+#   QUIZ_TTS_URL=http://127.0.0.1:8765/translate_tts streamlit run main.py
+#
+# 回傳的內容是 b'ID3' + 文字 (不是真正的 mp3)，只用來驗證流程。
+
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+class StubTTSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 說明：支援 keep-alive，才能觀察連線重用 (Keep-alive, so connection reuse is observable)
+    delay = 0.0
+    fail_rate = 0.0
+    connections = set()
+
+    def do_GET(self):
+        self.connections.add(self.client_address)
+        query = parse_qs(urlparse(self.path).query)
+        text = query.get('q', [''])[0]
+        if self.delay:
+            time.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            body, status = b'unavailable', 503
+        elif not text:
+            body, status = b'missing q', 400
+        else:
+            body, status = b'ID3' + text.encode('utf-8'), 200
+
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'audio/mpeg' if status == 200 else 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 說明：用戶端已逾時放棄 (The client timed out and hung up)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        print(f"[{len(self.connections)} connections] {format % args}")
+
+def make_server(host: str = '127.0.0.1', port: int = 0, delay: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """
+    建立假語音伺服器 (port=0 時由系統指定)，測試可在背景執行緒中執行 serve_forever。
+    Build a stub server (port 0 picks a free port); tests run serve_forever in a thread.
+    """
+    handler = type('ConfiguredStubTTSHandler', (StubTTSHandler,),
+                   {'delay': delay, 'fail_rate': fail_rate, 'connections': set()})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub TTS server")
+    parser.add_argument('--host', default='127.0.0.1', help="Bind address (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=8765, help="Port (default: %(default)s)")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before answering (default: 0)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of requests answered with 503 (default: 0)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.delay, args.fail_rate)
+    print(f"Stub TTS server on http://{args.host}:{args.port}/translate_tts (delay={args.delay}s, fail-rate={args.fail_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Tests for the live TTS client (circuit breaker, pooled session, stub server)
+# 線上語音用戶端測試：斷路器狀態轉換，以及對本機假語音伺服器的請求
+
+import threading
+
+import pytest
+
+import stub_tts_server
+from app.services.tts_client import (
+    BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, TTSClient,
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+# ==========================================
+# CircuitBreaker
+# ==========================================
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(3, 10, clock=FakeClock())
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert not breaker.allow()
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(2, 10, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+
+def test_half_open_allows_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(1, 10, clock=clock)
+    breaker.record_failure()
+    clock.now = 9.9
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert not breaker.allow()
+
+def test_probe_success_closes_and_failure_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(1, 10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert not breaker.allow()
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow()
+
+# ==========================================
+# TTSClient against stub_tts_server
+# ==========================================
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(delay: float = 0.0, fail_rate: float = 0.0) -> str:
+        server = stub_tts_server.make_server(delay=delay, fail_rate=fail_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}/translate_tts"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def make_client(url: str, failures: int = 3, timeout=(1, 1)) -> TTSClient:
+    return TTSClient(url, CircuitBreaker(failures, 60), pool_size=2, timeout=timeout)
+
+def test_fetch_returns_clip_and_reuses_connection(stub_server):
+    url = stub_server()
+    client = make_client(url)
+    assert client.fetch('山') == b'ID3' + '山'.encode('utf-8')
+    assert client.fetch('水') == b'ID3' + '水'.encode('utf-8')
+
+    stats = client.stats.snapshot()
+    assert stats['requests'] == 2
+    assert stats['failures'] == 0
+    assert len(client.session.adapters['http://'].poolmanager.pools) == 1
+
+def test_server_errors_open_the_breaker(stub_server):
+    client = make_client(stub_server(fail_rate=1.0), failures=2)
+    assert client.fetch('山') is None
+    assert client.fetch('山') is None
+    assert client.breaker.state == BREAKER_OPEN
+
+    # 說明：open 時直接失敗，不再送出請求 (Open breaker fails fast without a request)
+    assert client.fetch('山') is None
+    stats = client.stats.snapshot()
+    assert stats['requests'] == 2
+    assert stats['failures'] == 2
+    assert stats['rejected'] == 1
+
+def test_timeouts_count_as_failures(stub_server):
+    client = make_client(stub_server(delay=0.5), failures=1, timeout=(1, 0.1))
+    assert client.fetch('山') is None
+    assert client.breaker.state == BREAKER_OPEN
+    assert client.stats.snapshot()['failures'] == 1